@@ -0,0 +1,71 @@
+"""Compare the request size and latency of each turn of a conversation with the
+full and compact context strategies.
+
+    python benchmarks/conversation.py
+    python benchmarks/conversation.py --ai openai --turns 5
+"""
+from pathlib import Path
+
+import click
+from rich.console import Console
+from rich.table import Table
+
+from qwikcrud.provider import PROVIDERS, get_provider_class
+from qwikcrud.provider.base import AIProvider, ContextStrategy
+from qwikcrud.provider.dummy import DummyAIProvider
+
+PROMPT = Path(__file__).parent.parent / "examples/fastapi/task-management/prompt"
+
+MODIFICATIONS = [
+    "Add a Comment entity, each task can have many comments written by users.",
+    "Add a priority field to tasks with the values low, medium and high.",
+    "Add a Tag entity, a task can have many tags and a tag many tasks.",
+    "Add an avatar image to users.",
+    "Add an estimated_hours float field to tasks.",
+    "Add a Milestone entity, a project has many milestones.",
+    "Make the project name unique.",
+    "Add a completed_at datetime field to tasks.",
+    "Add a description text field to tags.",
+]
+
+
+def create_provider(name: str) -> AIProvider:
+    if name == "dummy":
+        return DummyAIProvider(delay=0)
+    return get_provider_class(name)()
+
+
+@click.command()
+@click.option(
+    "--ai",
+    "ai_provider",
+    type=click.Choice(["dummy", *PROVIDERS]),
+    default="dummy",
+    show_default=True,
+)
+@click.option("--turns", default=len(MODIFICATIONS) + 1, show_default=True)
+def main(ai_provider: str, turns: int) -> None:
+    prompts = [PROMPT.read_text(), *MODIFICATIONS][:turns]
+    table = Table(title=f"Context strategies ({ai_provider})")
+    table.add_column("Turn", justify="right")
+    for context in ContextStrategy:
+        table.add_column(f"{context.value} size (bytes)", justify="right")
+        table.add_column(f"{context.value} latency (s)", justify="right")
+    stats = {}
+    for context in ContextStrategy:
+        provider = create_provider(ai_provider)
+        provider.context = context
+        for prompt in prompts:
+            provider.query(prompt)
+        stats[context] = provider.turn_stats
+    for turn in range(len(prompts)):
+        row = [str(turn + 1)]
+        for context in ContextStrategy:
+            row.append(str(stats[context][turn].request_size))
+            row.append(f"{stats[context][turn].latency:.2f}")
+        table.add_row(*row)
+    Console().print(table)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""Measure the throughput of a generated app under concurrent reads and writes.
+
+The app of tests/dummy.json is generated, then worker processes run a mix of reads
+(`get_all`) and writes (`create`) through its CRUD objects and sessions for a fixed
+duration, like the workers of a server would. It is run against a fresh SQLite
+database without any pragma (SQLITE_PRAGMAS={}), then with the default pragmas of
+the generated settings.
+
+The generated app is imported by the workers, `--app-python` is a Python having the
+requirements of the generated app installed:
+
+    python benchmarks/database_concurrency.py --app-python venv/bin/python
+    python benchmarks/database_concurrency.py --workers 8 --write-ratio 0.5 --async-db
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import click
+from rich.console import Console
+from rich.table import Table
+
+from qwikcrud.generator import FastAPIAppGenerator
+from qwikcrud.schemas import App
+
+DUMMY_APP = Path(__file__).parent.parent / "tests/dummy.json"
+CONFIGURATIONS = {
+    "no pragma": "{}",
+    "default pragmas": None,
+}
+
+# Run in the directory of the generated app:
+#   setup ROWS: create the tables and insert ROWS products
+#   run START DURATION WRITE_RATIO SEED: print the latencies of the operations run
+#   from the START timestamp during DURATION seconds
+WORKER = """
+import asyncio, inspect, json, random, sys, time
+
+sys.path.insert(0, ".")
+from sqlalchemy.exc import OperationalError
+
+from app import crud
+from app.db import init_db
+from app.deps import get_db
+from app.models import Product
+from app.schemas import ProductCreate
+
+
+async def run_in_session(operation):
+    dependency = get_db()
+    if inspect.isasyncgen(dependency):
+        db = await dependency.__anext__()
+        try:
+            return await operation(db)
+        finally:
+            await dependency.aclose()
+    db = next(dependency)
+    try:
+        return await operation(db)
+    finally:
+        dependency.close()
+
+
+async def setup(rows):
+    await init_db()
+
+    async def insert(db):
+        db.add_all(
+            Product(name=f"product {i}", description="", price=i, in_stock=True)
+            for i in range(rows)
+        )
+        result = db.commit()
+        if inspect.isawaitable(result):
+            await result
+
+    await run_in_session(insert)
+
+
+async def run(start, duration, write_ratio, seed):
+    rng = random.Random(seed)
+
+    async def read(db):
+        await crud.product.get_all(db, skip=rng.randrange(1000), limit=20)
+
+    async def write(db):
+        product = ProductCreate(name="new", description="", price=1, in_stock=True)
+        await crud.product.create(db, obj_in=product)
+
+    latencies = {"read": [], "write": []}
+    errors = 0
+    time.sleep(max(0, start - time.time()))
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        kind = "write" if rng.random() < write_ratio else "read"
+        operation_start = time.perf_counter()
+        try:
+            await run_in_session(write if kind == "write" else read)
+        except OperationalError:
+            # database is locked
+            errors += 1
+            continue
+        latencies[kind].append(time.perf_counter() - operation_start)
+    print(json.dumps({"latencies": latencies, "errors": errors}))
+
+
+if sys.argv[1] == "setup":
+    asyncio.run(setup(int(sys.argv[2])))
+else:
+    asyncio.run(run(*map(float, sys.argv[2:5]), int(sys.argv[5])))
+"""
+
+
+def percentile(values: list[float], p: int) -> float:
+    if len(values) < 2:
+        return values[0] if values else 0
+    return statistics.quantiles(values, n=100)[p - 1]
+
+
+def run_configuration(
+    app_directory: Path,
+    app_python: str,
+    env: dict[str, str],
+    workers: int,
+    duration: float,
+    write_ratio: float,
+    rows: int,
+) -> dict[str, list]:
+    """Run the workers and return their latencies by kind of operation, and the
+    number of errors"""
+    subprocess.run(
+        [app_python, "-c", WORKER, "setup", str(rows)],  # noqa: S603
+        cwd=app_directory,
+        env=env,
+        check=True,
+    )
+    # Leave the time to the workers to import the app before starting
+    start = time.time() + 5
+    processes = [
+        subprocess.Popen(
+            [  # noqa: S603
+                app_python,
+                "-c",
+                WORKER,
+                "run",
+                *map(str, [start, duration, write_ratio, seed]),
+            ],
+            cwd=app_directory,
+            env=env,
+            stdout=subprocess.PIPE,
+        )
+        for seed in range(workers)
+    ]
+    results = {"read": [], "write": [], "errors": 0}
+    for process in processes:
+        output, _ = process.communicate()
+        if process.returncode != 0:
+            msg = "A worker failed"
+            raise click.ClickException(msg)
+        result = json.loads(output)
+        for kind in ["read", "write"]:
+            results[kind].extend(result["latencies"][kind])
+        results["errors"] += result["errors"]
+    return results
+
+
+@click.command()
+@click.option(
+    "--app-python",
+    default=sys.executable,
+    show_default=True,
+    help="The Python running the generated app",
+)
+@click.option("--workers", default=4, show_default=True)
+@click.option("--duration", default=5.0, show_default=True, help="In seconds")
+@click.option("--write-ratio", default=0.2, show_default=True)
+@click.option("--rows", default=10_000, show_default=True, help="Initial rows")
+@click.option("--async-db", is_flag=True, help="Generate the app with --async-db")
+def main(
+    app_python: str,
+    workers: int,
+    duration: float,
+    write_ratio: float,
+    rows: int,
+    async_db: bool,
+) -> None:
+    title = (
+        f"{workers} workers, {write_ratio:.0%} writes, {duration}s"
+        f" ({'async' if async_db else 'sync'} engine)"
+    )
+    table = Table(title=title)
+    for column in [
+        "SQLite",
+        "Operations/s",
+        "Reads/s",
+        "Writes/s",
+        "Read p50/p99 (ms)",
+        "Write p50/p99 (ms)",
+        "Errors",
+    ]:
+        table.add_column(column, justify="left" if column == "SQLite" else "right")
+    with tempfile.TemporaryDirectory() as directory:
+        app_directory = Path(directory)
+        app = App.model_validate_json(DUMMY_APP.read_text())
+        FastAPIAppGenerator(app_directory, async_db=async_db).generate(app)
+        driver = "sqlite+aiosqlite" if async_db else "sqlite"
+        for i, (name, pragmas) in enumerate(CONFIGURATIONS.items()):
+            env = {
+                **os.environ,
+                "SQLALCHEMY_DATABASE_URI": f"{driver}:///benchmark{i}.sqlite",
+            }
+            if pragmas is not None:
+                env["SQLITE_PRAGMAS"] = pragmas
+            results = run_configuration(
+                app_directory, app_python, env, workers, duration, write_ratio, rows
+            )
+            reads, writes = results["read"], results["write"]
+            table.add_row(
+                name,
+                f"{(len(reads) + len(writes)) / duration:.0f}",
+                f"{len(reads) / duration:.0f}",
+                f"{len(writes) / duration:.0f}",
+                *(
+                    f"{percentile(latencies, 50) * 1000:.1f}"
+                    f" / {percentile(latencies, 99) * 1000:.1f}"
+                    for latencies in [reads, writes]
+                ),
+                str(results["errors"]),
+            )
+    Console().print(table)
+
+
+if __name__ == "__main__":
+    main()
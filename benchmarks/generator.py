@@ -0,0 +1,169 @@
+"""Benchmark FastAPIAppGenerator.generate over synthetic apps of increasing size.
+
+Each size runs in a fresh process to measure its peak memory. The time is split
+into render, format and write. Results are compared to the saved baselines and the
+run fails when a size is slower or uses more memory than its baseline allows.
+
+    python benchmarks/generator.py                     # compare to the baselines
+    python benchmarks/generator.py --sizes 10,100      # only some sizes
+    python benchmarks/generator.py --save-baselines    # update the baselines
+    python benchmarks/generator.py --fast-format       # with the fast formatting
+"""
+import json
+import multiprocessing
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import click
+from rich.console import Console
+from rich.table import Table
+
+from qwikcrud.generator import FastAPIAppGenerator
+from qwikcrud.profiling import Profiler
+from qwikcrud.schemas import (
+    App,
+    Constraints,
+    Entity,
+    FieldModel,
+    FieldType,
+    Relation,
+    RelationType,
+)
+
+BASELINES = Path(__file__).parent / "baselines.json"
+PHASES = ["render", "format", "write"]
+
+
+def synthetic_field(entity_index: int, field_type: FieldType) -> FieldModel:
+    name = f"{field_type.value.lower()}_value"
+    constraints = Constraints()
+    if field_type == FieldType.String:
+        constraints = Constraints(unique=entity_index % 2 == 0, max_length=100)
+    elif field_type == FieldType.Integer:
+        constraints = Constraints(ge=0, not_null=True)
+    elif field_type == FieldType.Enum:
+        name = f"status{entity_index}"
+        constraints = Constraints(allowed_values=["draft", "in review", "published"])
+    elif field_type == FieldType.File:
+        constraints = Constraints(mime_types=["application/pdf", "text/plain"])
+    return FieldModel(name=name, type=field_type, constraints=constraints)
+
+
+def synthetic_app(size: int) -> App:
+    """Build an app of `size` entities, each having a field of every type, and
+    `size - 1` relations cycling through all the relation types."""
+    relation_types = list(RelationType)
+    entities = [
+        Entity(
+            name=f"Entity{i}",
+            fields=[synthetic_field(i, field_type) for field_type in FieldType],
+        )
+        for i in range(size)
+    ]
+    relations = [
+        Relation(
+            name=f"Entity{i}_Entity{i + 1}",
+            type=relation_types[i % len(relation_types)],
+            **{"from": f"Entity{i}"},
+            to=f"Entity{i + 1}",
+            field_name=f"entity{i + 1}_items",
+            backref_field_name=f"entity{i}_owner",
+        )
+        for i in range(size - 1)
+    ]
+    return App(
+        name=f"synthetic{size}",
+        description=f"A synthetic app with {size} entities",
+        entities=entities,
+        relations=relations,
+    )
+
+
+def run(size: int, fast_format: bool = False) -> dict[str, float]:
+    app = synthetic_app(size)
+    profiler = Profiler()
+    with tempfile.TemporaryDirectory() as output_directory:
+        generator = FastAPIAppGenerator(
+            Path(output_directory), profiler=profiler, fast_format=fast_format
+        )
+        start = time.perf_counter()
+        generator.generate(app)
+        total = time.perf_counter() - start
+    totals = profiler.totals()
+    result = {phase: totals.get(phase, 0.0) for phase in PHASES}
+    result["total"] = total
+    # ru_maxrss is in kilobytes on Linux
+    result["peak_memory_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return result
+
+
+def run_isolated(size: int, fast_format: bool = False) -> dict[str, float]:
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        return executor.submit(run, size, fast_format).result()
+
+
+def regressions(
+    result: dict[str, float], baseline: dict[str, float], tolerance: float
+) -> list[str]:
+    return [
+        f"{metric}: {result[metric]:.2f} > {baseline[metric]:.2f}"
+        for metric in ["total", "peak_memory_mb"]
+        if result[metric] > baseline[metric] * (1 + tolerance)
+    ]
+
+
+@click.command()
+@click.option("--sizes", default="10,100,1000", show_default=True)
+@click.option(
+    "--tolerance",
+    default=0.25,
+    show_default=True,
+    help="Allowed relative increase over the baselines.",
+)
+@click.option("--save-baselines", is_flag=True)
+@click.option(
+    "--fast-format",
+    is_flag=True,
+    help="Generate with fast_format, compared to their own baselines.",
+)
+def main(sizes: str, tolerance: float, save_baselines: bool, fast_format: bool):
+    baselines = json.loads(BASELINES.read_text()) if BASELINES.exists() else {}
+    title = "FastAPIAppGenerator.generate"
+    table = Table(title=f"{title} (fast format)" if fast_format else title)
+    for column in ["Entities", *PHASES, "total", "peak memory (MB)", "baseline"]:
+        table.add_column(column, justify="right")
+    failures = []
+    for size in [int(size) for size in sizes.split(",")]:
+        result = run_isolated(size, fast_format)
+        key = f"{size}-fast-format" if fast_format else str(size)
+        baseline = baselines.get(key)
+        status = "-"
+        if save_baselines:
+            baselines[key] = result
+        elif baseline is not None:
+            errors = regressions(result, baseline, tolerance)
+            failures.extend(f"{size} entities, {error}" for error in errors)
+            status = "[red]regression[/red]" if errors else "[green]ok[/green]"
+        table.add_row(
+            str(size),
+            *(f"{result[phase]:.2f}s" for phase in [*PHASES, "total"]),
+            f"{result['peak_memory_mb']:.0f}",
+            status,
+        )
+    console = Console()
+    console.print(table)
+    if save_baselines:
+        BASELINES.write_text(json.dumps(baselines, indent=4) + "\n")
+    for failure in failures:
+        console.print(f"[red]Regression[/red] for {failure}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""Compare the latency of the offset and cursor pagination of a generated app.
+
+The app of tests/dummy.json is generated and its SQLite database filled with
+`--rows` products. Pages of 100 products are then read at increasing depths
+through `crud.product.get_page`, either skipping the previous products (`skip`) or
+starting after the cursor of the previous page, sorted by id and by price (a column
+without index).
+
+The generated app is imported by a separate process, `--app-python` is a Python
+having the requirements of the generated app installed:
+
+    python benchmarks/pagination.py --app-python venv/bin/python
+    python benchmarks/pagination.py --rows 100000 --runs 10 --async-db
+"""
+import json
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import click
+from rich.console import Console
+from rich.table import Table
+
+from qwikcrud.generator import FastAPIAppGenerator
+from qwikcrud.schemas import App
+
+DUMMY_APP = Path(__file__).parent.parent / "tests/dummy.json"
+
+# Run in the directory of the generated app with ROWS RUNS ORDER_BY,... DEPTH,...:
+# print the median latency of the pages read at each depth, by sort key and
+# pagination mode
+WORKER = """
+import asyncio, inspect, json, random, statistics, sys, time
+
+sys.path.insert(0, ".")
+from sqlalchemy import insert
+
+from app import crud
+from app.db import init_db
+from app.deps import get_db
+from app.models import Product
+
+PAGE_SIZE = 100
+
+
+async def run_in_session(operation):
+    dependency = get_db()
+    if inspect.isasyncgen(dependency):
+        db = await dependency.__anext__()
+        try:
+            return await operation(db)
+        finally:
+            await dependency.aclose()
+    db = next(dependency)
+    try:
+        return await operation(db)
+    finally:
+        dependency.close()
+
+
+async def maybe_await(result):
+    if inspect.isawaitable(result):
+        return await result
+    return result
+
+
+async def fill(db, rows):
+    rng = random.Random(0)
+    for start in range(0, rows, 10_000):
+        products = [
+            {"name": f"product {i}", "description": "", "price": rng.random(),
+             "in_stock": True}
+            for i in range(start, min(start + 10_000, rows))
+        ]
+        await maybe_await(db.execute(insert(Product), products))
+    await maybe_await(db.commit())
+
+
+async def latency(runs, **kwargs):
+    async def read_page(db):
+        start = time.perf_counter()
+        await crud.product.get_page(db, limit=PAGE_SIZE, **kwargs)
+        return time.perf_counter() - start
+
+    return statistics.median([await run_in_session(read_page) for _ in range(runs)])
+
+
+async def main(rows, runs, orders, depths):
+    await init_db()
+    await run_in_session(lambda db: fill(db, rows))
+    results = {}
+    for order_by in orders:
+        results[order_by] = {}
+        for depth in depths:
+            async def cursor_at(db):
+                # The cursor of the page starting at `depth`
+                previous_page = await crud.product.get_page(
+                    db, skip=depth - PAGE_SIZE, limit=PAGE_SIZE, order_by=order_by
+                )
+                return previous_page.next_cursor
+
+            cursor = await run_in_session(cursor_at) if depth else None
+            results[order_by][depth] = {
+                "offset": await latency(runs, skip=depth, order_by=order_by),
+                "cursor": await latency(runs, cursor=cursor, order_by=order_by),
+            }
+    print(json.dumps(results))
+
+
+asyncio.run(
+    main(
+        int(sys.argv[1]),
+        int(sys.argv[2]),
+        sys.argv[3].split(","),
+        [int(depth) for depth in sys.argv[4].split(",")],
+    )
+)
+"""
+
+
+@click.command()
+@click.option(
+    "--app-python",
+    default=sys.executable,
+    show_default=True,
+    help="The Python running the generated app",
+)
+@click.option("--rows", default=1_000_000, show_default=True)
+@click.option("--runs", default=5, show_default=True, help="Runs per page")
+@click.option("--async-db", is_flag=True, help="Generate the app with --async-db")
+def main(app_python: str, rows: int, runs: int, async_db: bool) -> None:
+    depths = [0, *(depth for depth in [1_000, 10_000, 100_000] if depth < rows)]
+    depths.append(rows - 100)
+    orders = ["id", "price"]
+    with tempfile.TemporaryDirectory() as directory:
+        app = App.model_validate_json(DUMMY_APP.read_text())
+        FastAPIAppGenerator(Path(directory), async_db=async_db).generate(app)
+        output = subprocess.run(
+            [  # noqa: S603
+                app_python,
+                "-c",
+                WORKER,
+                str(rows),
+                str(runs),
+                ",".join(orders),
+                ",".join(map(str, depths)),
+            ],
+            cwd=directory,
+            check=True,
+            stdout=subprocess.PIPE,
+        ).stdout
+    results = json.loads(output)
+    table = Table(title=f"Page of 100 products out of {rows} (median of {runs} runs)")
+    table.add_column("Depth", justify="right")
+    for order_by in orders:
+        for mode in ["offset", "cursor"]:
+            table.add_column(f"{mode}, by {order_by} (ms)", justify="right")
+    for depth in depths:
+        table.add_row(
+            str(depth),
+            *(
+                f"{results[order_by][str(depth)][mode] * 1000:.2f}"
+                for order_by in orders
+                for mode in ["offset", "cursor"]
+            ),
+        )
+    Console().print(table)
+
+
+if __name__ == "__main__":
+    main()
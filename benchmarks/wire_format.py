@@ -0,0 +1,111 @@
+"""Compare the size, output tokens and latency of the responses in each wire format.
+
+The example apps are encoded offline, then the example prompt is sent to the AI
+provider in each wire format. Tokens are counted with tiktoken when it is installed,
+otherwise estimated at 4 characters per token (the titles of the tables then say
+"estimated"). The latency is the end to end time of the query, which the dummy
+provider does not simulate.
+
+    python benchmarks/wire_format.py
+    python benchmarks/wire_format.py --ai openai --runs 3
+"""
+import statistics
+from pathlib import Path
+
+import click
+from rich.console import Console
+from rich.table import Table
+
+from qwikcrud.provider import PROVIDERS, get_provider_class
+from qwikcrud.provider.base import AIProvider
+from qwikcrud.provider.dummy import DummyAIProvider
+from qwikcrud.schemas import App
+from qwikcrud.wire import WireFormat, encode_app
+
+ROOT = Path(__file__).parent.parent
+EXAMPLES = ROOT / "examples/fastapi/task-management"
+PROMPT = EXAMPLES / "prompt"
+APPS = {
+    "dummy": ROOT / "tests/dummy.json",
+    "task-management (openai)": EXAMPLES / "generated/openai/.qwikcrud.json.lock",
+    "task-management (gemini-pro)": (
+        EXAMPLES / "generated/gemini-pro/.qwikcrud.json.lock"
+    ),
+}
+
+
+def count_tokens(text: str) -> int:
+    try:
+        import tiktoken
+    except ImportError:
+        return round(len(text) / 4)
+    return len(tiktoken.get_encoding("cl100k_base").encode(text))
+
+
+def tokens_title() -> str:
+    try:
+        import tiktoken  # noqa: F401
+    except ImportError:
+        return "output tokens, estimated"
+    return "output tokens"
+
+
+def create_provider(name: str, wire_format: WireFormat) -> AIProvider:
+    if name == "dummy":
+        return DummyAIProvider(delay=0, wire_format=wire_format)
+    return get_provider_class(name)(wire_format)
+
+
+def examples_table() -> Table:
+    table = Table(title=f"Example apps ({tokens_title()})")
+    table.add_column("App")
+    for wire_format in WireFormat:
+        table.add_column(wire_format.value, justify="right")
+    table.add_column("Saved", justify="right")
+    for name, path in APPS.items():
+        app = App.model_validate_json(path.read_text())
+        tokens = [count_tokens(encode_app(app, f)) for f in WireFormat]
+        table.add_row(name, *map(str, tokens), f"{1 - tokens[-1] / tokens[0]:.0%}")
+    return table
+
+
+@click.command()
+@click.option(
+    "--ai",
+    "ai_provider",
+    type=click.Choice(["dummy", *PROVIDERS]),
+    default="dummy",
+    show_default=True,
+)
+@click.option("--runs", default=1, show_default=True)
+def main(ai_provider: str, runs: int) -> None:
+    console = Console()
+    console.print(examples_table())
+    table = Table(
+        title=f"Example prompt ({ai_provider}, {tokens_title()}, median of {runs} runs)"
+    )
+    for column in ["Wire format", "Response (bytes)", "Output tokens", "Latency (s)"]:
+        table.add_column(column, justify="left" if column == "Wire format" else "right")
+    for wire_format in WireFormat:
+        sizes, tokens, latencies = [], [], []
+        for _ in range(runs):
+            provider = create_provider(ai_provider, wire_format)
+            provider.query(PROMPT.read_text())
+            message = provider.messages[-1]
+            content = (
+                message["content"] if "content" in message else message["parts"][0]
+            )
+            sizes.append(provider.turn_stats[-1].response_size)
+            tokens.append(count_tokens(content))
+            latencies.append(provider.turn_stats[-1].latency)
+        table.add_row(
+            wire_format.value,
+            str(statistics.median(sizes)),
+            str(statistics.median(tokens)),
+            f"{statistics.median(latencies):.2f}",
+        )
+    console.print(table)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+import time
+from collections import Counter
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+from qwikcrud.generator import Layout, create_fastapi_generator
+from qwikcrud.provider import create_provider
+from qwikcrud.schemas import App
+
+
+class BatchOptions(NamedTuple):
+    ai_provider: str = "google"
+    format_cache: bool = True
+    cache_responses: bool = False
+    replay: bool = False
+    layout: Layout = Layout.SINGLE
+    fast_format: bool = False
+    wire_format: str = "json"
+    async_db: bool = False
+
+
+class SpecResult(NamedTuple):
+    spec: Path
+    output_directory: Path
+    entities: int = 0
+    query_time: float = 0
+    """Time spent waiting for the AI, 0 for JSON specs"""
+    generation_time: float = 0
+    error: Optional[str] = None
+
+
+def find_specs(directory: Path) -> list[Path]:
+    """Return the specs of `directory`: App JSON files (`*.json`) and prompt files
+    (any other file), and the `prompt` and `*.json` files of its subdirectories, one
+    per app like in `examples/fastapi/<name>/prompt`."""
+    specs = []
+    for path in directory.iterdir():
+        if path.name.startswith("."):
+            continue
+        if path.is_file():
+            specs.append(path)
+        elif path.is_dir():
+            specs.extend(
+                spec
+                for spec in path.iterdir()
+                if spec.is_file()
+                and not spec.name.startswith(".")
+                and (spec.name == "prompt" or spec.suffix == ".json")
+            )
+    return sorted(specs)
+
+
+def spec_output_directories(
+    specs: list[Path], specs_directory: Path, output_directory: Path
+) -> dict[Path, Path]:
+    """Map each spec found in `specs_directory` to the directory of
+    `output_directory` its app is generated into, named after the spec without its
+    extension, or after its subdirectory of `specs_directory`.
+
+    Raise ValueError if several specs would be generated into the same directory.
+    """
+    directories = {
+        spec: output_directory
+        / (spec.stem if spec.parent == specs_directory else spec.parent.name)
+        for spec in specs
+    }
+    counts = Counter(directories.values())
+    duplicates = [
+        spec.relative_to(specs_directory).as_posix()
+        for spec, path in directories.items()
+        if counts[path] > 1
+    ]
+    if duplicates:
+        msg = f"Specs generated into the same directory: {', '.join(duplicates)}"
+        raise ValueError(msg)
+    return directories
+
+
+def generate_spec(
+    spec: Path, output_directory: Path, options: BatchOptions
+) -> SpecResult:
+    """Generate the app described by `spec` into `output_directory`.
+
+    Errors are reported in the result instead of being raised so that a failing spec
+    doesn't stop the others.
+    """
+    query_time = 0.0
+    try:
+        start = time.perf_counter()
+        if spec.suffix == ".json":
+            app = App.model_validate_json(spec.read_text())
+        else:
+            ai = create_provider(
+                options.ai_provider,
+                cache_responses=options.cache_responses,
+                replay=options.replay,
+                wire_format=options.wire_format,
+            )
+            app = ai.query(spec.read_text())
+            query_time = time.perf_counter() - start
+        start = time.perf_counter()
+        create_fastapi_generator(
+            output_directory,
+            format_cache=options.format_cache,
+            layout=options.layout,
+            fast_format=options.fast_format,
+            async_db=options.async_db,
+        ).generate(app)
+        generation_time = time.perf_counter() - start
+    except Exception as e:
+        return SpecResult(
+            spec,
+            output_directory,
+            query_time=query_time,
+            error=f"{type(e).__name__}: {e}",
+        )
+    return SpecResult(
+        spec, output_directory, len(app.entities), query_time, generation_time
+    )
+
+
+def run_batch(
+    specs: list[Path],
+    specs_directory: Path,
+    output_directory: Path,
+    jobs: int,
+    options: BatchOptions,
+) -> Iterator[SpecResult]:
+    """Generate each spec into its own directory inside `output_directory`, using a
+    pool of `jobs` worker processes. Results are yielded as the specs complete.
+
+    Raise ValueError before generating anything if several specs would be generated
+    into the same directory, see `spec_output_directories`.
+    """
+    directories = spec_output_directories(specs, specs_directory, output_directory)
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [
+            executor.submit(generate_spec, spec, directories[spec], options)
+            for spec in specs
+        ]
+        for future in as_completed(futures):
+            yield future.result()
@@ -0,0 +1,90 @@
+import contextlib
+import hashlib
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional
+
+
+def hash_key(*parts: str) -> str:
+    """Build a cache key from the sha256 digest of `parts`"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class DiskCache:
+    """A content-addressed cache storing each entry in its own file.
+
+    The total size of the entries is capped by `max_size` (in bytes). The access
+    time of an entry is refreshed every time it is read, and the least recently
+    used entries are evicted first when the cache is full. When `ttl` is set,
+    entries written more than `ttl` seconds ago are considered as missing.
+    """
+
+    def __init__(
+        self, directory: Path, max_size: int, ttl: Optional[float] = None
+    ) -> None:
+        self.directory = directory
+        self.max_size = max_size
+        self.ttl = ttl
+        self._size: Optional[int] = None
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / key
+
+    def _entries(self) -> list[Path]:
+        return [path for path in self.directory.glob("*/*") if path.is_file()]
+
+    def get(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            modified_at = path.stat().st_mtime
+            if self.ttl is not None and time.time() - modified_at > self.ttl:
+                return None
+            value = path.read_text()
+            # Only the access time is refreshed, the modification time being the
+            # time the entry was written.
+            os.utime(path, (time.time(), modified_at))
+        except OSError:
+            return None
+        return value
+
+    def put(self, key: str, value: str) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write into a temporary file first so that readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent)
+        with os.fdopen(fd, "w") as file:
+            file.write(value)
+        os.replace(tmp_path, path)
+        if self._size is None:
+            self._size = sum(entry.stat().st_size for entry in self._entries())
+        else:
+            self._size += path.stat().st_size
+        if self._size > self.max_size:
+            self._evict()
+
+    def _evict(self) -> None:
+        entries = []
+        for entry in self._entries():
+            with contextlib.suppress(FileNotFoundError):
+                stat = entry.stat()
+                entries.append((stat.st_atime, stat.st_size, entry))
+        entries.sort()
+        self._size = sum(size for (_, size, _) in entries)
+        for _, size, entry in entries:
+            if self._size <= self.max_size:
+                break
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(entry)
+            self._size -= size
+
+    def clear(self) -> None:
+        for entry in self._entries():
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(entry)
+        self._size = 0
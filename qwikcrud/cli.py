@@ -1,45 +1,226 @@
 import logging
+import os
 import sys
+import threading
 from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Optional, Union
 
 import click
 import prompt_toolkit as pt
 from prompt_toolkit.auto_suggest import AutoSuggestFromHistory
 from prompt_toolkit.history import FileHistory
 from rich.console import Console
+from rich.markup import escape
 from rich.status import Status
+from rich.table import Table
 
 from qwikcrud import __version__
-from qwikcrud.generator import FastAPIAppGenerator
+from qwikcrud.batch import (
+    BatchOptions,
+    find_specs,
+    run_batch,
+    spec_output_directories,
+)
+from qwikcrud.generator import BaseAppGenerator, Layout, create_fastapi_generator
 from qwikcrud.logger import setup_logging
-from qwikcrud.provider.base import AIProvider
-from qwikcrud.provider.google import GoogleProvider
-from qwikcrud.provider.openai import OpenAIProvider
+from qwikcrud.profiling import Profiler, Span
+from qwikcrud.provider import PROVIDERS, create_provider
+from qwikcrud.provider.base import AIProvider, ContextStrategy
+from qwikcrud.schemas import Entity, Relation
+from qwikcrud.wire import WireFormat
+
+if TYPE_CHECKING:
+    from qwikcrud.provider.hedged import HedgedProvider
+
+
+def progress_reporter(
+    status: Status, ai: Union[AIProvider, "HedgedProvider"]
+) -> Callable[[Union[Entity, Relation]], None]:
+    """Show the entities and relations received so far in the status"""
+    received: list[str] = []
+
+    def on_progress(item: Union[Entity, Relation]) -> None:
+        received.append(item.name)
+        status.update(
+            f"[dim]Asking {ai.get_name()} … received {', '.join(received)}[/dim]"
+        )
+
+    return on_progress
+
 
+def start_warm_up(code_generator: BaseAppGenerator) -> threading.Thread:
+    """Warm up the generator in a background thread, while waiting for the AI. A
+    failure is only logged, the generation reports it if it happens again."""
+
+    def warm_up() -> None:
+        try:
+            code_generator.warm_up()
+        except Exception:
+            logging.exception("The warm-up of the generator failed")
 
-@click.command()
+    thread = threading.Thread(target=warm_up, daemon=True)
+    thread.start()
+    return thread
+
+
+def profile_table(profiler: Profiler) -> Table:
+    """Summarize the time spent in each phase, with its slowest span"""
+    spans_by_phase: dict[str, list[Span]] = {}
+    for span in profiler.spans:
+        spans_by_phase.setdefault(span.category, []).append(span)
+    elapsed = max((s.start + s.duration for s in profiler.spans), default=0.0)
+    table = Table(title="Profile", caption=f"{elapsed:.2f}s elapsed")
+    for column in ["Phase", "Spans", "Total (s)", "Slowest"]:
+        table.add_column(column, justify="left" if column == "Phase" else "right")
+    for phase, spans in spans_by_phase.items():
+        slowest = max(spans, key=lambda span: span.duration)
+        table.add_row(
+            phase,
+            str(len(spans)),
+            f"{sum(span.duration for span in spans):.2f}",
+            f"{escape(slowest.name)} ({slowest.duration:.2f}s)",
+        )
+    return table
+
+
+@click.group(invoke_without_command=True)
 @click.option(
     "-o", "--output-dir", default=".", help="Output directory for the generated app."
 )
 @click.option(
     "--ai",
     "ai_provider",
-    type=click.Choice(["google", "openai"]),
+    type=click.Choice(list(PROVIDERS)),
     default="google",
     help="Choose the AI provider to use for generation. Default is Google.",
 )
-def main(output_dir: str, ai_provider: AIProvider) -> None:
+@click.option(
+    "--hedge",
+    "hedge_provider",
+    type=click.Choice(list(PROVIDERS)),
+    help="Also send the prompts to this AI provider when the first one doesn't answer"
+    " within --hedge-delay seconds, and use the first valid app received.",
+)
+@click.option(
+    "--hedge-delay",
+    type=click.FloatRange(min=0),
+    default=10.0,
+    help="Seconds to wait for the first AI provider before sending the prompt to the"
+    " --hedge one, 0 sends it to both at once. Default is 10.",
+)
+@click.option(
+    "-j",
+    "--jobs",
+    type=click.IntRange(min=1),
+    default=1,
+    help="Number of worker processes used to format the generated code. Default is 1.",
+)
+@click.option(
+    "--format-cache/--no-format-cache",
+    default=True,
+    help="Reuse the formatted code of unchanged files from previous generations.",
+)
+@click.option(
+    "--cache-responses",
+    is_flag=True,
+    help="Save the AI responses on disk and reuse them for identical conversations.",
+)
+@click.option(
+    "--replay",
+    is_flag=True,
+    help="Only use the saved AI responses, fail if a response is not in the cache.",
+)
+@click.option(
+    "--context",
+    type=click.Choice([c.value for c in ContextStrategy]),
+    default=ContextStrategy.FULL.value,
+    help="What is sent to the AI at each prompt: the whole conversation (full) or"
+    " only the current app and the latest prompt (compact). Default is full.",
+)
+@click.option(
+    "--wire-format",
+    type=click.Choice([f.value for f in WireFormat]),
+    default=WireFormat.JSON.value,
+    help="How the AI writes the app: the JSON of the app schema (json) or a JSON"
+    " with short keys, which needs about half the output tokens (compact). Default"
+    " is json.",
+)
+@click.option(
+    "--layout",
+    type=click.Choice([layout.value for layout in Layout]),
+    default=Layout.SINGLE.value,
+    help="Generate the models, schemas and CRUD objects into single modules (single)"
+    " or into one module per entity (per-entity). Default is single.",
+)
+@click.option(
+    "--fast-format",
+    is_flag=True,
+    help="Only remove the unused imports and sort the imports of the generated"
+    " code, instead of running all the formatters on it.",
+)
+@click.option(
+    "--async-db",
+    is_flag=True,
+    help="Generate an app using an async SQLAlchemy engine and sessions.",
+)
+@click.option(
+    "--profile",
+    is_flag=True,
+    help="Print the time spent in each phase (AI query, validation, rendering,"
+    " formatting and writing) after each generation.",
+)
+@click.option(
+    "--profile-trace",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Save the timings of the last generation into this JSON file (Trace Event"
+    " Format, viewable in Perfetto or speedscope). Implies --profile.",
+)
+@click.pass_context
+def main(
+    ctx: click.Context,
+    output_dir: str,
+    ai_provider: str,
+    hedge_provider: Optional[str],
+    hedge_delay: float,
+    jobs: int,
+    format_cache: bool,
+    cache_responses: bool,
+    replay: bool,
+    context: str,
+    wire_format: str,
+    layout: str,
+    fast_format: bool,
+    async_db: bool,
+    profile: bool,
+    profile_trace: Optional[Path],
+) -> None:
+    """Describe your app and let the AI generate it.
+
+    Without any command, start an interactive session.
+    """
     setup_logging()
+    if ctx.invoked_subcommand is not None:
+        return
 
     history = Path().home() / ".qwikcrud-prompt-history.txt"
     session = pt.PromptSession(history=FileHistory(str(history)))
 
-    ai_provider_map: dict[str, type[AIProvider]] = {
-        "google": GoogleProvider,
-        "openai": OpenAIProvider,
-    }
-    ai = ai_provider_map[ai_provider]()
-    code_generator = FastAPIAppGenerator(Path(output_dir).resolve())
+    ai = create_provider(ai_provider, context, cache_responses, replay, wire_format)
+    if hedge_provider is not None:
+        from qwikcrud.provider.hedged import HedgedProvider
+
+        hedge = create_provider(
+            hedge_provider, context, cache_responses, replay, wire_format
+        )
+        ai = HedgedProvider([ai, hedge], hedge_delay)
+    code_generator = create_fastapi_generator(
+        Path(output_dir).resolve(),
+        jobs=jobs,
+        format_cache=format_cache,
+        layout=Layout(layout),
+        fast_format=fast_format,
+        async_db=async_db,
+    )
 
     console = Console()
     console.print(
@@ -55,16 +236,30 @@ def main(output_dir: str, ai_provider: AIProvider) -> None:
             auto_suggest=AutoSuggestFromHistory(),
         )
         if prompt == "/exit":
+            code_generator.close()
             return
+        profiler = Profiler() if profile or profile_trace else None
+        ai.profiler = code_generator.profiler = profiler
         try:
             with Status(
                 f"[dim]Asking {ai.get_name()} …[/dim]", console=console
             ) as status:
-                app = ai.query(prompt)
+                warm_up = start_warm_up(code_generator)
+                app = ai.query_stream(prompt, progress_reporter(status, ai))
                 status.update("[dim]Generating the app[/dim]")
-                code_generator.clean()
-                code_generator.generate(app)
+                warm_up.join()
+                code_generator.generate(app, incremental=True)
             console.print(f"App successfully generated in {Path(output_dir).resolve()}")
+            if code_generator.format_cache is not None:
+                console.print(
+                    f"[dim]Format cache: {code_generator.format_cache_hits} hits,"
+                    f" {code_generator.format_cache_misses} misses[/dim]"
+                )
+            if profiler is not None:
+                console.print(profile_table(profiler))
+            if profile_trace is not None:
+                profiler.write_trace(profile_trace)
+                console.print(f"[dim]Profile trace saved to {profile_trace}[/dim]")
             console.print("\nHere is the summary of the generated app:\n")
             app.summary()
             console.print(
@@ -80,5 +275,136 @@ def main(output_dir: str, ai_provider: AIProvider) -> None:
             console.print("[red]Something went wrong, Try again![/red]")
 
 
+@main.command()
+@click.argument(
+    "specs_dir",
+    type=click.Path(exists=True, file_okay=False, path_type=Path),
+)
+@click.option(
+    "-o",
+    "--output-dir",
+    type=click.Path(file_okay=False, path_type=Path),
+    required=True,
+    help="Directory in which each app is generated into its own subdirectory.",
+)
+@click.option(
+    "--ai",
+    "ai_provider",
+    type=click.Choice(list(PROVIDERS)),
+    default="google",
+    help="AI provider used for the prompt files. Default is Google.",
+)
+@click.option(
+    "-j",
+    "--jobs",
+    type=click.IntRange(min=1),
+    default=os.cpu_count(),
+    help="Number of specs generated in parallel. Default is the number of CPUs.",
+)
+@click.option(
+    "--format-cache/--no-format-cache",
+    default=True,
+    help="Reuse the formatted code of unchanged files from previous generations.",
+)
+@click.option(
+    "--cache-responses",
+    is_flag=True,
+    help="Save the AI responses on disk and reuse them for identical prompts.",
+)
+@click.option(
+    "--replay",
+    is_flag=True,
+    help="Only use the saved AI responses, fail if a response is not in the cache.",
+)
+@click.option(
+    "--wire-format",
+    type=click.Choice([f.value for f in WireFormat]),
+    default=WireFormat.JSON.value,
+    help="How the AI writes the app: the JSON of the app schema (json) or a JSON"
+    " with short keys, which needs about half the output tokens (compact). Default"
+    " is json.",
+)
+@click.option(
+    "--layout",
+    type=click.Choice([layout.value for layout in Layout]),
+    default=Layout.SINGLE.value,
+    help="Generate the models, schemas and CRUD objects into single modules (single)"
+    " or into one module per entity (per-entity). Default is single.",
+)
+@click.option(
+    "--fast-format",
+    is_flag=True,
+    help="Only remove the unused imports and sort the imports of the generated"
+    " code, instead of running all the formatters on it.",
+)
+@click.option(
+    "--async-db",
+    is_flag=True,
+    help="Generate an app using an async SQLAlchemy engine and sessions.",
+)
+def batch(
+    specs_dir: Path,
+    output_dir: Path,
+    ai_provider: str,
+    jobs: int,
+    format_cache: bool,
+    cache_responses: bool,
+    replay: bool,
+    wire_format: str,
+    layout: str,
+    fast_format: bool,
+    async_db: bool,
+) -> None:
+    """Generate an app for each spec of SPECS_DIR, without any interaction.
+
+    A spec is either an App JSON file (*.json) or a file containing a prompt. The
+    subdirectories of SPECS_DIR can also contain a spec each, in a file named prompt
+    or *.json.
+    """
+    specs = find_specs(specs_dir)
+    if not specs:
+        msg = f"No spec found in {specs_dir}"
+        raise click.UsageError(msg)
+    try:
+        spec_output_directories(specs, specs_dir, output_dir)
+    except ValueError as e:
+        raise click.UsageError(str(e)) from e
+    options = BatchOptions(
+        ai_provider,
+        format_cache,
+        cache_responses,
+        replay,
+        Layout(layout),
+        fast_format,
+        wire_format,
+        async_db,
+    )
+    console = Console()
+    table = Table(title=f"Generated {len(specs)} specs into {output_dir.resolve()}")
+    for column in ["Spec", "Entities", "AI query (s)", "Generation (s)", "Status"]:
+        table.add_column(column, justify="left" if column == "Spec" else "right")
+    failures = []
+    with Status("[dim]Generating the apps[/dim]", console=console) as status:
+        for i, result in enumerate(
+            run_batch(specs, specs_dir, output_dir, jobs, options)
+        ):
+            status.update(f"[dim]Generating the apps ({i + 1}/{len(specs)})[/dim]")
+            if result.error is not None:
+                failures.append(result)
+            table.add_row(
+                result.spec.relative_to(specs_dir).as_posix(),
+                str(result.entities),
+                f"{result.query_time:.2f}",
+                f"{result.generation_time:.2f}",
+                "[green]OK[/green]" if result.error is None else "[red]Failed[/red]",
+            )
+    console.print(table)
+    for result in failures:
+        spec = result.spec.relative_to(specs_dir).as_posix()
+        console.print(f"[red]{spec}[/red]: {escape(result.error)}")
+    if failures:
+        sys.exit(1)
+
+
 if __name__ == "__main__":
     sys.exit(main())
@@ -0,0 +1,221 @@
+"""Fast path of the formatting of the generated code.
+
+The templates render code that is already formatted the way black formats it. The
+lines that the names of the app can make too long are rendered with the
+`fit_lines` filter, which splits them in a form that black leaves as is. What's
+left is to remove the unused imports and sort the remaining ones: unused imports
+are found with `ast` instead of autoflake (pyflakes), which is much faster.
+
+The code is formatted with black, autoflake and isort as soon as a line is still
+too long. The golden tests of tests/test_formatting.py check that both produce the
+same code.
+"""
+import ast
+from collections.abc import Iterator
+from typing import Optional, Union
+
+# The line length of black
+MAX_LINE_LENGTH = 88
+INDENT = "    "
+OPENING_BRACKETS = "([{"
+CLOSING_BRACKETS = ")]}"
+
+ImportNode = Union[ast.Import, ast.ImportFrom]
+
+
+def fast_format_python_code(code_text: str) -> Optional[str]:
+    """Remove the unused imports and sort the remaining ones.
+
+    Return None when the code can't be formatted this way: a line is too long or
+    removing the unused imports would leave an empty block. The code should then be
+    formatted with `format_python_code`.
+    """
+    import isort
+
+    if any(_too_long(line) for line in code_text.splitlines()):
+        return None
+    code_text = remove_unused_imports(code_text)
+    if code_text is None:
+        return None
+    # Jinja removes the trailing newline of the templates
+    code_text = code_text.rstrip()
+    return isort.code(f"{code_text}\n" if code_text else "")
+
+
+def _too_long(line: str) -> bool:
+    # isort rewrites the imports and black leaves the comments as they are
+    return len(line) > MAX_LINE_LENGTH and not line.lstrip().startswith(
+        ("import ", "from ", "#")
+    )
+
+
+def fit_lines(text: str) -> str:
+    """Split the lines of the text that are too long the way black keeps them.
+
+    A line is split at its last bracket pair, or at the first one for a function
+    definition, with one item per line and a magic trailing comma. A string assigned
+    on its own is put in parentheses, split in several strings if needed. The lines
+    that can't be split this way are left too long.
+    """
+    return "".join(_fit_line(line) for line in text.splitlines(keepends=True))
+
+
+def _fit_line(line: str) -> str:
+    code = line.rstrip("\n")
+    if len(code) <= MAX_LINE_LENGTH or code.lstrip().startswith("#"):
+        return line
+    indent = code[: len(code) - len(code.lstrip())]
+    brackets = [pair for pair in _brackets(code) if pair[1] > pair[0] + 1]
+    if not brackets:
+        lines = _fit_string_assignment(code, indent)
+    else:
+        definition = code.lstrip().startswith(("def ", "async def "))
+        start, end = brackets[0] if definition else brackets[-1]
+        items = _split_items(code[start + 1 : end])
+        # Black doesn't explode the subscripts of a single item
+        if code[start] == "[" and len(items) == 1:
+            return line
+        lines = [
+            code[: start + 1],
+            *(_fit_line(f"{indent}{INDENT}{item},") for item in items),
+            f"{indent}{code[end:]}",
+        ]
+    return "\n".join(lines) + line[len(code) :] if lines else line
+
+
+def _fit_string_assignment(code: str, indent: str) -> list[str]:
+    target, equal, value = code.partition(" = ")
+    if not (equal and value[0] == value[-1] == '"' and '"' not in value[1:-1]):
+        return []
+    width = MAX_LINE_LENGTH - len(indent + INDENT)
+    chunks = [value]
+    while len(chunks[-1]) > width:
+        cut = chunks[-1].rfind(" ", 0, width - 1) + 1
+        if cut <= 1:
+            return []
+        chunks[-1:] = [f'{chunks[-1][:cut]}"', f'"{chunks[-1][cut:]}']
+    return [
+        f"{target} = (",
+        *(f"{indent}{INDENT}{chunk}" for chunk in chunks),
+        f"{indent})",
+    ]
+
+
+def _brackets(code: str) -> list[tuple[int, int]]:
+    """The positions of the outermost bracket pairs of a line"""
+    pairs = []
+    start = 0
+    for i, char, depth in _scan(code):
+        if char in OPENING_BRACKETS and depth == 1:
+            start = i
+        elif char in CLOSING_BRACKETS and depth == 0:
+            pairs.append((start, i))
+    return pairs
+
+
+def _split_items(code: str) -> list[str]:
+    """The items separated by commas outside of brackets"""
+    commas = [i for i, char, depth in _scan(code) if char == "," and depth == 0]
+    bounds = zip([-1, *commas], [*commas, len(code)])
+    items = [code[start + 1 : end].strip() for start, end in bounds]
+    return [item for item in items if item]
+
+
+def _scan(code: str) -> Iterator[tuple[int, str, int]]:
+    """The characters of a line outside of strings, with the bracket depth after
+    each of them"""
+    depth = 0
+    quote = None
+    for i, char in enumerate(code):
+        if quote:
+            if char == quote and code[i - 1] != "\\":
+                quote = None
+        elif char in "\"'":
+            quote = char
+        else:
+            if char in OPENING_BRACKETS:
+                depth += 1
+            elif char in CLOSING_BRACKETS:
+                depth -= 1
+            yield i, char, depth
+
+
+def remove_unused_imports(code_text: str) -> Optional[str]:
+    """Same as `autoflake.fix_code(code_text, remove_all_unused_imports=True)`, for
+    imports written on a single line. Return None if a block would become empty."""
+    tree = ast.parse(code_text)
+    used_names = _used_names(tree)
+    lines = code_text.splitlines(keepends=True)
+    blocks = [tree.body] + [
+        node.body for node in ast.walk(tree) if isinstance(node, ast.If)
+    ]
+    for body in blocks:
+        imports = [
+            node for node in body if isinstance(node, (ast.Import, ast.ImportFrom))
+        ]
+        kept = {id(node): _kept_aliases(node, used_names) for node in imports}
+        if (
+            body is not tree.body
+            and len(body) == len(imports)
+            and not any(kept.values())
+        ):
+            return None
+        for node in imports:
+            if len(kept[id(node)]) < len(node.names):
+                lines[node.lineno - 1] = _import_line(node, kept[id(node)])
+    return "".join(lines)
+
+
+def _kept_aliases(node: ImportNode, used_names: set[str]) -> list[ast.alias]:
+    return [
+        alias
+        for alias in node.names
+        if (alias.asname or alias.name).split(".")[0] in used_names
+    ]
+
+
+def _import_line(node: ImportNode, aliases: list[ast.alias]) -> str:
+    if not aliases:
+        return ""
+    names = ", ".join(
+        f"{alias.name} as {alias.asname}" if alias.asname else alias.name
+        for alias in aliases
+    )
+    indent = " " * node.col_offset
+    if isinstance(node, ast.Import):
+        return f"{indent}import {names}\n"
+    return f"{indent}from {'.' * node.level}{node.module or ''} import {names}\n"
+
+
+def _used_names(tree: ast.Module) -> set[str]:
+    """The names used in the module, including those of the string annotations
+    (forward references) and of `__all__`"""
+    names = set()
+    annotations = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name):
+            names.add(node.id)
+        elif isinstance(node, ast.AnnAssign):
+            annotations.append(node.annotation)
+        elif isinstance(node, ast.arg) and node.annotation is not None:
+            annotations.append(node.annotation)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.returns:
+            annotations.append(node.returns)
+        elif isinstance(node, ast.Assign) and any(
+            isinstance(target, ast.Name) and target.id == "__all__"
+            for target in node.targets
+        ):
+            names.update(
+                element.value
+                for element in ast.walk(node.value)
+                if isinstance(element, ast.Constant) and isinstance(element.value, str)
+            )
+    for annotation in annotations:
+        for node in ast.walk(annotation):
+            if isinstance(node, ast.Constant) and isinstance(node.value, str):
+                names.update(
+                    name.id
+                    for name in ast.walk(ast.parse(node.value, mode="eval"))
+                    if isinstance(name, ast.Name)
+                )
+    return names
@@ -1,34 +1,329 @@
+import json
+import threading
 from abc import abstractmethod
+from collections.abc import Iterator
+from concurrent.futures import Executor, ProcessPoolExecutor, as_completed
+from enum import Enum
 from pathlib import Path
+from typing import Any, Callable, Optional
 
-import autoflake
-import black
-import isort
-from jinja2 import Environment, FileSystemLoader
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
 
+from qwikcrud import __version__, profiling
 from qwikcrud import helpers as h
-from qwikcrud.schemas import App
+from qwikcrud.cache import DiskCache, hash_key
+from qwikcrud.formatting import fast_format_python_code, fit_lines
+from qwikcrud.output import OutputTree
+from qwikcrud.profiling import Profiler
+from qwikcrud.schemas import App, Entity
+from qwikcrud.settings import settings
+
+LOCK_FILE = ".qwikcrud.json.lock"
+LOCK_OPTIONS_KEY = "qwikcrud"
+
+
+def format_python_code(code_text: str) -> str:
+    """Format the code with black, remove unused imports and sort the remaining ones.
+
+    This is a module level function so that it can be sent to worker processes.
+    The formatters are imported here as they are slow to import and not needed
+    until the first file gets formatted.
+    """
+    import autoflake
+    import black
+    import isort
+
+    code_text = black.format_str(code_text, mode=black.Mode())
+    code_text = autoflake.fix_code(code_text, remove_all_unused_imports=True)
+    return isort.code(code_text)
+
+
+def format_canonical_python_code(code_text: str) -> str:
+    """Format code rendered by templates that are already formatted the way black
+    formats code: only its imports are formatted, unless it isn't supported by
+    `fast_format_python_code`."""
+    formatted_code = fast_format_python_code(code_text)
+    if formatted_code is None:
+        return format_python_code(code_text)
+    return formatted_code
+
+
+def formatters_version() -> str:
+    import autoflake
+    import black
+    import isort
+
+    return f"black={black.__version__};autoflake={autoflake.__version__};isort={isort.__version__}"
+
+
+class Layout(str, Enum):
+    """How the models, schemas and CRUD objects of the generated app are organized"""
+
+    # All the entities in app/models.py, app/schemas.py and app/crud.py
+    SINGLE = "single"
+    # One module per entity in the app/models, app/schemas and app/crud packages
+    PER_ENTITY = "per-entity"
+
+
+class AppChanges:
+    """Describe what changed between the previously generated app (read from the lock
+    file) and the app about to be generated. Without a previous app, everything is
+    considered as changed."""
+
+    def __init__(self, previous: Optional[App], current: App) -> None:
+        self.previous = previous
+        self.current = current
+
+    @property
+    def everything(self) -> bool:
+        return self.previous is None
+
+    def metadata(self) -> bool:
+        """Whether the name or the description of the app changed"""
+        return self.everything or (self.previous.name, self.previous.description) != (
+            self.current.name,
+            self.current.description,
+        )
+
+    def schema(self) -> bool:
+        """Whether any entity or relation changed"""
+        return self.everything or self.previous.model_dump(
+            include={"entities", "relations"}
+        ) != self.current.model_dump(include={"entities", "relations"})
+
+    def entity(self, entity: Entity) -> bool:
+        """Whether the entity or any relation it is part of changed"""
+        if self.everything:
+            return True
+        return self._entity_state(self.previous, entity.name) != self._entity_state(
+            self.current, entity.name
+        )
+
+    @staticmethod
+    def _entity_state(app: App, name: str):
+        entity = app.get_entity(name)
+        relations = [r.model_dump() for r in app.relations_of(name)]
+        return entity.model_dump() if entity else None, relations
 
 
 class BaseAppGenerator:
-    def __init__(self, output_directory: Path) -> None:
+    managed_directories: tuple[str, ...] = ()
+    """The directories of the output directory owned by the generator, their files
+    that are not generated anymore get deleted"""
+
+    def __init__(
+        self,
+        output_directory: Path,
+        jobs: int = 1,
+        format_cache: Optional[DiskCache] = None,
+        template_cache_dir: Optional[Path] = None,
+        profiler: Optional[Profiler] = None,
+        layout: Layout = Layout.SINGLE,
+        fast_format: bool = False,
+        async_db: bool = False,
+    ) -> None:
+        bytecode_cache = None
+        if template_cache_dir is not None:
+            # The compiled templates are stored along with the checksum of their
+            # source, a template is recompiled as soon as its source changes.
+            h.make_dirs(template_cache_dir)
+            bytecode_cache = FileSystemBytecodeCache(str(template_cache_dir))
         self.env = Environment(  # noqa: S701
             loader=FileSystemLoader(h.path_to("templates")),
             trim_blocks=True,
             lstrip_blocks=True,
+            bytecode_cache=bytecode_cache,
         )
         self.env.filters["snake_case"] = h.snake_case
+        self.env.filters["fit_lines"] = fit_lines
+        self.layout = Layout(layout)
+        self.env.globals["layout"] = self.layout.value
+        self.async_db = async_db
+        self.env.globals["async_db"] = async_db
         self.output_directory = output_directory
+        self.jobs = jobs
+        self.fast_format = fast_format
+        self.format_cache = format_cache
+        self.format_cache_hits = 0
+        self.format_cache_misses = 0
+        self.profiler = profiler
+        self.tree = OutputTree()
+        self._pending_files: list[tuple[str, str, bool]] = []
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._warm_up_lock = threading.Lock()
+        self._warmed_up = False
 
-    def _write_code_into_file(self, path, code_text: str, format_code: bool = True):
-        with open(self.output_directory / f"{path}", "w") as file:
-            if format_code:
-                code_text = black.format_str(code_text, mode=black.Mode())
-                code_text = autoflake.fix_code(
-                    code_text, remove_all_unused_imports=True
-                )
-                code_text = isort.code(code_text)
-            file.write(code_text)
+    def compile_templates(self) -> None:
+        """Load all the templates of this generator, filling the bytecode cache"""
+        for name in self.env.list_templates(extensions=["j2"]):
+            if name.startswith(self._absolute_template_path("")):
+                self.env.get_template(name)
+
+    def warm_up(self) -> None:
+        """Do the work the first generation would otherwise wait for: import the
+        formatters, load the templates and, when `jobs` is greater than 1, start the
+        worker processes, which are then kept for the next generations until
+        `close` is called.
+
+        This is meant to run in a background thread while waiting for the app, it
+        does nothing once done.
+        """
+        with self._warm_up_lock:
+            if self._warmed_up:
+                return
+            with self._span("warm-up", "formatters"):
+                self._formatter()("import os\n")
+            with self._span("warm-up", "templates"):
+                self.compile_templates()
+            if self.jobs > 1:
+                with self._span("warm-up", "worker processes"):
+                    executor = ProcessPoolExecutor(max_workers=self.jobs)
+                    futures = [
+                        executor.submit(self._formatter(), "import os\n")
+                        for _ in range(self.jobs)
+                    ]
+                    for future in futures:
+                        future.result()
+                self._executor = executor
+            self._warmed_up = True
+
+    def close(self) -> None:
+        """Stop the worker processes started by `warm_up`"""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        self._warmed_up = False
+
+    def _span(self, category: str, name: str = ""):
+        """Measure the time spent in the block if a profiler is set"""
+        return profiling.span(self.profiler, category, name)
+
+    def _add_to_tree(self, path, code_text: str, format_code: bool = True):
+        if format_code:
+            with self._span("format", f"{path}"):
+                code_text = self._formatter()(code_text)
+        self.tree.add(f"{path}", code_text)
+
+    def _add_file(self, path, code_text: str, format_code: bool = True):
+        """Queue a file to be formatted and added to the tree by
+        `_format_pending_files`."""
+        self._pending_files.append((path, code_text, format_code))
+
+    def _keep_file(self, path) -> bool:
+        """Keep an existing file of the output directory as it is. Return False if
+        the file doesn't exist."""
+        file_path = self.output_directory / f"{path}"
+        if not file_path.is_file():
+            return False
+        self.tree.keep(f"{path}", file_path)
+        return True
+
+    def _options(self) -> dict[str, Any]:
+        """The version of qwikcrud and the options the files are generated with"""
+        return {
+            "version": __version__,
+            "layout": self.layout.value,
+            "fast_format": self.fast_format,
+            "async_db": self.async_db,
+        }
+
+    def _read_lock(self) -> Optional[App]:
+        """Return the app saved in the lock file by the previous generation, if any.
+
+        None is also returned when the previous generation used another version of
+        qwikcrud or other options, as all of the files have to be generated again.
+        """
+        try:
+            content = (self.output_directory / LOCK_FILE).read_text()
+            app = App.model_validate_json(content)
+            options = json.loads(content).get(LOCK_OPTIONS_KEY)
+        except (OSError, ValueError):
+            return None
+        if options != self._options():
+            return None
+        h.apply_python_naming_convention(app)
+        return app
+
+    def _lock(self, app: App) -> str:
+        """The content of the lock file: the app, along with the options under a key
+        that is ignored when the lock file is read as an app"""
+        lock = app.model_dump(mode="json", exclude_unset=True, by_alias=True)
+        lock[LOCK_OPTIONS_KEY] = self._options()
+        return json.dumps(lock, indent=4, ensure_ascii=False)
+
+    def _format_pending_files(self) -> None:
+        """Format all the queued files and add them to the output tree.
+
+        Files found in the format cache are added right away, the others are
+        formatted (in a pool of worker processes when `jobs` is greater than 1) and
+        added as soon as their formatting is done.
+        """
+        pending_files, self._pending_files = self._pending_files, []
+        self.format_cache_hits = self.format_cache_misses = 0
+        files_to_format = []
+        for path, code_text, format_code in pending_files:
+            if not format_code:
+                self._add_to_tree(path, code_text, format_code=False)
+                continue
+            formatted_code = self._get_cached_format(code_text)
+            if formatted_code is None:
+                files_to_format.append((path, code_text))
+            else:
+                self._add_to_tree(path, formatted_code, format_code=False)
+        for path, code_text, formatted_code in self._format_files(files_to_format):
+            if self.format_cache is not None:
+                self.format_cache.put(self._format_cache_key(code_text), formatted_code)
+            self._add_to_tree(path, formatted_code, format_code=False)
+
+    def _format_files(
+        self, files: list[tuple[str, str]]
+    ) -> Iterator[tuple[str, str, str]]:
+        """Yield `(path, code_text, formatted_code)` as each file gets formatted"""
+        if self.jobs <= 1 or len(files) <= 1:
+            for path, code_text in files:
+                with self._span("format", path):
+                    formatted_code = self._formatter()(code_text)
+                yield path, code_text, formatted_code
+            return
+        if self._executor is not None:
+            yield from self._format_in_workers(self._executor, files)
+            return
+        with ProcessPoolExecutor(max_workers=self.jobs) as executor:
+            yield from self._format_in_workers(executor, files)
+
+    def _format_in_workers(
+        self, executor: Executor, files: list[tuple[str, str]]
+    ) -> Iterator[tuple[str, str, str]]:
+        futures = {
+            executor.submit(self._formatter(), code_text): (path, code_text)
+            for path, code_text in files
+        }
+        completed = as_completed(futures)
+        for _ in range(len(futures)):
+            # Only the time spent waiting for the workers is measured
+            with self._span("format", "worker processes"):
+                future = next(completed)
+                formatted_code = future.result()
+            path, code_text = futures[future]
+            yield path, code_text, formatted_code
+
+    def _formatter(self) -> Callable[[str], str]:
+        """The function formatting the rendered code, see `fast_format`"""
+        return format_canonical_python_code if self.fast_format else format_python_code
+
+    def _format_cache_key(self, code_text: str) -> str:
+        mode = "fast" if self.fast_format else "full"
+        return hash_key(formatters_version(), mode, code_text)
+
+    def _get_cached_format(self, code_text: str) -> Optional[str]:
+        if self.format_cache is None:
+            return None
+        formatted_code = self.format_cache.get(self._format_cache_key(code_text))
+        if formatted_code is None:
+            self.format_cache_misses += 1
+        else:
+            self.format_cache_hits += 1
+        return formatted_code
 
     def _generate_from_template(
         self,
@@ -38,24 +333,30 @@ class BaseAppGenerator:
         template_data=None,
         skip_render=False,
         extension="py",
+        changed=True,
     ):
         if template_data is None:
             template_data = {"app": app}
         if destination_path is None:
             destination_path = relative_template_path
+        if not changed and self._keep_file(f"{destination_path}.{extension}"):
+            return
         if skip_render:
             template_text = open(
                 f"{h.path_to('templates')}/{self._absolute_template_path(f'{relative_template_path}.{extension}')}"
             ).read()
-            self._write_code_into_file(
+            self._add_file(
                 f"{destination_path}.{extension}", template_text, extension == "py"
             )
         else:
-            template = self.env.get_template(
-                self._absolute_template_path(f"{relative_template_path}.{extension}.j2")
-            )
-            rendered_code = template.render(template_data)
-            self._write_code_into_file(
+            with self._span("render", f"{destination_path}.{extension}"):
+                template = self.env.get_template(
+                    self._absolute_template_path(
+                        f"{relative_template_path}.{extension}.j2"
+                    )
+                )
+                rendered_code = template.render(template_data)
+            self._add_file(
                 f"{destination_path}.{extension}", rendered_code, extension == "py"
             )
 
@@ -64,60 +365,109 @@ class BaseAppGenerator:
         raise NotImplementedError
 
     @abstractmethod
-    def generate(self, app: App) -> None:
+    def render(self, app: App, incremental: bool = False) -> OutputTree:
+        """Generate the files of the app in memory.
+
+        With `incremental`, the app is compared to the one saved in the lock file of
+        the output directory and the files that are not affected are kept as they
+        are.
+        """
         raise NotImplementedError
 
+    def generate(self, app: App, incremental: bool = False) -> None:
+        """Generate the app into the output directory.
+
+        The previous content of the output directory is only replaced once all the
+        files are generated, see `OutputTree.flush`.
+        """
+        tree = self.render(app, incremental)
+        tree.flush(self.output_directory, self.managed_directories, self.profiler)
+
     @abstractmethod
     def clean(self):
         raise NotImplementedError
 
 
 class FastAPIAppGenerator(BaseAppGenerator):
+    managed_directories = ("app", "templates", "static")
+
     def _absolute_template_path(self, relative_path: str) -> str:
         return f"fastapi/{relative_path}"
 
-    def generate(self, app: App) -> None:
+    def render(self, app: App, incremental: bool = False) -> OutputTree:
         h.apply_python_naming_convention(app)
-        h.make_dirs(self.output_directory / "app")
-        h.make_dirs(self.output_directory / "templates")
-        h.make_dirs(self.output_directory / "static/css")
-        self._generate_from_template(app, "app/__init__")
-        self._generate_from_template(app, "app/models")
-        self._generate_from_template(app, "app/schemas")
-        self._generate_from_template(app, "app/crud")
-        self._generate_from_template(app, "app/deps")
-        self._generate_from_template(app, "app/settings")
-        self._generate_from_template(app, "app/db")
-        self._generate_from_template(app, "app/pre_start")
-        self._generate_from_template(app, "app/main")
-        self._generate_from_template(app, "app/admin")
-        self._generate_from_template(app, "requirements", extension="txt")
-        self._generate_from_template(app, "README", extension="md")
+        changes = AppChanges(self._read_lock() if incremental else None, app)
+        self.tree = OutputTree()
+        static = changes.everything
+        schema = changes.schema()
+        self._generate_from_template(app, "app/__init__", changed=static)
+        if self.layout == Layout.PER_ENTITY:
+            self.__generate_per_entity_modules(app, changes)
+        else:
+            self._generate_from_template(app, "app/models", changed=schema)
+            self._generate_from_template(app, "app/schemas", changed=schema)
+            self._generate_from_template(app, "app/crud", changed=schema)
+        self._generate_from_template(app, "app/deps", changed=static)
+        self._generate_from_template(app, "app/settings", changed=changes.metadata())
+        self._generate_from_template(app, "app/db", changed=static)
+        self._generate_from_template(app, "app/pre_start", changed=schema)
+        self._generate_from_template(app, "app/main", changed=schema)
+        self._generate_from_template(app, "app/admin", changed=schema)
+        self._generate_from_template(
+            app, "requirements", extension="txt", changed=static
+        )
+        self._generate_from_template(
+            app, "README", extension="md", changed=changes.metadata()
+        )
         self._generate_from_template(
-            app, "templates/index", extension="html", skip_render=True
+            app, "templates/index", extension="html", skip_render=True, changed=static
         )
         self._generate_from_template(
-            app, "static/css/style", extension="css", skip_render=True
+            app, "static/css/style", extension="css", skip_render=True, changed=static
         )
-        self.__generate_endpoints(app)
+        self.__generate_endpoints(app, changes)
         if app.has_file():
-            self._generate_from_template(app, "app/storage")
+            self._generate_from_template(app, "app/storage", changed=schema)
         if app.has_enum():
-            self._generate_from_template(app, "app/enums")
-        self._write_code_into_file(
-            ".qwikcrud.json.lock",
-            app.model_dump_json(indent=4, exclude_unset=True, by_alias=True),
-            format_code=False,
-        )
+            self._generate_from_template(app, "app/enums", changed=schema)
+        self._add_file(LOCK_FILE, self._lock(app), format_code=False)
+        self._format_pending_files()
+        return self.tree
 
-    def __generate_endpoints(self, app: App) -> None:
-        h.make_dirs(self.output_directory / "app/endpoints")
-        self._generate_from_template(app, "app/endpoints/__init__")
+    def __generate_per_entity_modules(self, app: App, changes: AppChanges) -> None:
+        schema = changes.schema()
+        for package in ["models", "schemas", "crud"]:
+            self._generate_from_template(app, f"app/{package}/__init__", changed=schema)
+        self._generate_from_template(app, "app/models/base", changed=schema)
+        self._generate_from_template(app, "app/crud/base", changed=changes.everything)
+        if app.has_file():
+            self._generate_from_template(app, "app/schemas/files", changed=schema)
+        for entity in app.entities:
+            module = h.snake_case(entity.name)
+            template_data = {"entity": entity, "app": app}
+            changed = changes.entity(entity)
+            for template_path, destination_path in [
+                ("app/models/entity", f"app/models/{module}"),
+                ("app/schemas/entity", f"app/schemas/{module}"),
+                ("app/crud/entity", f"app/crud/crud_{module}"),
+            ]:
+                self._generate_from_template(
+                    app, template_path, destination_path, template_data, changed=changed
+                )
+
+    def __generate_endpoints(self, app: App, changes: AppChanges) -> None:
+        self._generate_from_template(
+            app, "app/endpoints/__init__", changed=changes.everything
+        )
         for entity in app.entities:
             template_path = "app/endpoints/template"
             destination_path = f"app/endpoints/{entity.name.lower()}"
             self._generate_from_template(
-                app, template_path, destination_path, {"entity": entity, "app": app}
+                app,
+                template_path,
+                destination_path,
+                {"entity": entity, "app": app},
+                changed=changes.entity(entity),
             )
 
     def clean(self):
@@ -126,3 +476,27 @@ class FastAPIAppGenerator(BaseAppGenerator):
         h.delete_dir(self.output_directory / "static")
         h.delete_file(self.output_directory / "requirements.txt")
         h.delete_file(self.output_directory / "README.md")
+
+
+def create_fastapi_generator(
+    output_directory: Path,
+    jobs: int = 1,
+    format_cache: bool = True,
+    layout: Layout = Layout.SINGLE,
+    fast_format: bool = False,
+    async_db: bool = False,
+) -> FastAPIAppGenerator:
+    """Instantiate a FastAPI generator using the qwikcrud cache directory"""
+    return FastAPIAppGenerator(
+        output_directory,
+        jobs=jobs,
+        format_cache=(
+            DiskCache(settings.cache_dir / "format", settings.format_cache_max_size)
+            if format_cache
+            else None
+        ),
+        template_cache_dir=settings.cache_dir / "templates",
+        layout=layout,
+        fast_format=fast_format,
+        async_db=async_db,
+    )
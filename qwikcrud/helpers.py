@@ -61,3 +61,4 @@ def apply_python_naming_convention(app: "App"):
     for relation in app.relations:
         relation.field_name = snake_case(relation.field_name)
         relation.backref_field_name = snake_case(relation.backref_field_name)
+    app.reindex()
@@ -0,0 +1,151 @@
+import io
+import os
+import shutil
+import tarfile
+import tempfile
+import time
+import zipfile
+from collections.abc import Iterable
+from pathlib import Path
+from typing import BinaryIO, Optional, Union
+
+from qwikcrud import profiling
+from qwikcrud.profiling import Profiler
+
+ARCHIVE_FORMATS = ["zip", "tar", "tar.gz"]
+
+
+class OutputTree:
+    """The files of a generated app, kept in memory until they are flushed into a
+    directory or exported as an archive.
+
+    Paths are relative and use forward slashes, e.g. `app/models.py`.
+    """
+
+    def __init__(self) -> None:
+        self.files: dict[str, Union[str, Path]] = {}
+        """The content of each file, or the path of an existing file to reuse"""
+
+    def add(self, path: str, content: str) -> None:
+        self.files[path] = content
+
+    def keep(self, path: str, source: Path) -> None:
+        """Reuse the existing file `source` as it is"""
+        self.files[path] = source
+
+    def __contains__(self, path: str) -> bool:
+        return path in self.files
+
+    def read(self, path: str) -> bytes:
+        content = self.files[path]
+        if isinstance(content, Path):
+            return content.read_bytes()
+        return content.encode()
+
+    def flush(
+        self,
+        directory: Path,
+        managed: Iterable[str] = (),
+        profiler: Optional[Profiler] = None,
+    ) -> None:
+        """Write the tree into `directory`, replacing its previous content.
+
+        The files are first written into a staging directory, then each top-level
+        entry of the tree and of `managed` (the directories owned by the generator)
+        is swapped into place with a rename, so a failure leaves the previous tree
+        untouched. Files that didn't change, and the bytecode caches of the
+        previous tree, are hard-linked to keep their modification time.
+
+        The `profiler` records a write span for each file, and one for the swap.
+        """
+        directory.mkdir(parents=True, exist_ok=True)
+        staging = Path(tempfile.mkdtemp(prefix=".qwikcrud-staging-", dir=directory))
+        backup = Path(tempfile.mkdtemp(prefix=".qwikcrud-backup-", dir=directory))
+        try:
+            for path in self.files:
+                with profiling.span(profiler, "write", path):
+                    self._stage_file(path, directory, staging)
+            entries = sorted({path.split("/")[0] for path in self.files} | {*managed})
+            with profiling.span(profiler, "write", "swap"):
+                self._stage_bytecode(directory, staging, entries)
+                self._swap(directory, staging, backup, entries)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+            shutil.rmtree(backup, ignore_errors=True)
+
+    def _stage_file(self, path: str, directory: Path, staging: Path) -> None:
+        content = self.files[path]
+        target = staging / path
+        target.parent.mkdir(parents=True, exist_ok=True)
+        source = content if isinstance(content, Path) else directory / path
+        if isinstance(content, Path) or (
+            source.is_file() and source.read_text() == content
+        ):
+            _link_or_copy(source, target)
+        else:
+            target.write_text(content)
+
+    @staticmethod
+    def _stage_bytecode(directory: Path, staging: Path, entries: list[str]) -> None:
+        for entry in entries:
+            if not (directory / entry).is_dir():
+                continue
+            for cache_directory in (directory / entry).rglob("__pycache__"):
+                relative_path = cache_directory.relative_to(directory)
+                if not (staging / relative_path.parent).is_dir():
+                    continue
+                (staging / relative_path).mkdir(exist_ok=True)
+                for file_path in cache_directory.glob("*.pyc"):
+                    _link_or_copy(file_path, staging / relative_path / file_path.name)
+
+    @staticmethod
+    def _swap(directory: Path, staging: Path, backup: Path, entries: list[str]):
+        """Move the previous entries into `backup` and the staged ones in their
+        place, restoring the previous entries on failure."""
+        moved: list[str] = []
+        installed: list[str] = []
+        try:
+            for entry in entries:
+                if (directory / entry).exists():
+                    os.replace(directory / entry, backup / entry)
+                    moved.append(entry)
+                if (staging / entry).exists():
+                    os.replace(staging / entry, directory / entry)
+                    installed.append(entry)
+        except BaseException:
+            for entry in installed:
+                os.replace(directory / entry, staging / entry)
+            for entry in moved:
+                os.replace(backup / entry, directory / entry)
+            raise
+
+    def write_archive(self, file: BinaryIO, archive_format: str = "zip") -> None:
+        """Write the tree into `file` as a zip, tar or gzipped tar archive.
+
+        The archive is written sequentially, `file` can be a socket or an HTTP
+        response stream.
+        """
+        if archive_format == "zip":
+            with zipfile.ZipFile(file, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+                for path in self.files:
+                    zf.writestr(path, self.read(path))
+        elif archive_format in ("tar", "tar.gz"):
+            mode = "w|gz" if archive_format == "tar.gz" else "w|"
+            with tarfile.open(fileobj=file, mode=mode) as tf:
+                now = time.time()
+                for path in self.files:
+                    data = self.read(path)
+                    info = tarfile.TarInfo(path)
+                    info.size = len(data)
+                    info.mtime = now
+                    tf.addfile(info, io.BytesIO(data))
+        else:
+            msg = f"Unsupported archive format {archive_format!r}, expected one of {ARCHIVE_FORMATS}"
+            raise ValueError(msg)
+
+
+def _link_or_copy(source: Path, target: Path) -> None:
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)
@@ -0,0 +1,76 @@
+import contextlib
+import json
+import os
+import time
+from collections import defaultdict
+from collections.abc import Iterator
+from contextlib import AbstractContextManager
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+
+class Span(NamedTuple):
+    category: str
+    """The phase of the span, e.g. render, format or write"""
+    name: str
+    """What the span is about, e.g. the path of the file"""
+    start: float
+    """Start time in seconds, relative to the creation of the profiler"""
+    duration: float
+
+
+class Profiler:
+    """Record the time spent in each phase of a generation.
+
+    Example:
+        profiler = Profiler()
+        with profiler.span("render", "app/models.py"):
+            ...
+        print(profiler.totals())
+    """
+
+    def __init__(self) -> None:
+        self.spans: list[Span] = []
+        self._origin = time.perf_counter()
+
+    @contextlib.contextmanager
+    def span(self, category: str, name: str = "") -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            self.spans.append(Span(category, name, start - self._origin, end - start))
+
+    def totals(self) -> dict[str, float]:
+        """Total duration of the spans of each category"""
+        totals: dict[str, float] = defaultdict(float)
+        for span in self.spans:
+            totals[span.category] += span.duration
+        return dict(totals)
+
+    def write_trace(self, path: Path) -> None:
+        """Save the spans in the Trace Event Format, which can be loaded into
+        chrome://tracing, Perfetto or speedscope to see them as a flame graph"""
+        events = [
+            {
+                "name": span.name or span.category,
+                "cat": span.category,
+                "ph": "X",
+                "ts": span.start * 1e6,
+                "dur": span.duration * 1e6,
+                "pid": os.getpid(),
+                "tid": 0,
+            }
+            for span in self.spans
+        ]
+        path.write_text(json.dumps({"traceEvents": events}, indent=1))
+
+
+def span(
+    profiler: Optional[Profiler], category: str, name: str = ""
+) -> AbstractContextManager[None]:
+    """Measure the time spent in the block if there is a profiler"""
+    if profiler is None:
+        return contextlib.nullcontext()
+    return profiler.span(category, name)
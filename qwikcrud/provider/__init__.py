@@ -0,0 +1,44 @@
+import importlib
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from qwikcrud.provider.base import AIProvider
+
+# Providers are imported on demand, their SDKs being slow to import
+PROVIDERS: dict[str, str] = {
+    "google": "qwikcrud.provider.google:GoogleProvider",
+    "openai": "qwikcrud.provider.openai:OpenAIProvider",
+}
+
+
+def get_provider_class(name: str) -> "type[AIProvider]":
+    module_name, class_name = PROVIDERS[name].split(":")
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def create_provider(
+    name: str,
+    context: str = "full",
+    cache_responses: bool = False,
+    replay: bool = False,
+    wire_format: str = "json",
+) -> "AIProvider":
+    """Instantiate the provider `name` configured from the command-line options"""
+    from qwikcrud.cache import DiskCache
+    from qwikcrud.provider.base import ContextStrategy
+    from qwikcrud.provider.cache import ResponseCache
+    from qwikcrud.settings import settings
+    from qwikcrud.wire import WireFormat
+
+    ai = get_provider_class(name)(WireFormat(wire_format))
+    ai.context = ContextStrategy(context)
+    if cache_responses or replay:
+        ai.response_cache = ResponseCache(
+            DiskCache(
+                settings.cache_dir / "responses",
+                settings.response_cache_max_size,
+                ttl=settings.response_cache_ttl,
+            ),
+            replay=replay,
+        )
+    return ai
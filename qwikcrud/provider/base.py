@@ -1,16 +1,246 @@
+import asyncio
+import json
+import logging
+import time
 from abc import abstractmethod
+from collections.abc import Iterator
+from contextlib import contextmanager
+from enum import Enum
+from typing import Any, Callable, NamedTuple, Optional, Union
 
-from qwikcrud.schemas import App
+from qwikcrud import helpers as h
+from qwikcrud import profiling
+from qwikcrud.profiling import Profiler
+from qwikcrud.provider.cache import ResponseCache
+from qwikcrud.repair import InvalidAppError, parse_app
+from qwikcrud.schemas import App, Entity, Relation
+from qwikcrud.streaming import AppStreamParser
+from qwikcrud.wire import WireFormat, encode_app
+
+
+class ContextStrategy(str, Enum):
+    """What is sent to the model at each turn of the conversation"""
+
+    # The system prompt followed by every previous prompt and response
+    FULL = "full"
+    # The system prompt, the current app as compact JSON and the latest prompt
+    COMPACT = "compact"
+
+
+class TurnStats(NamedTuple):
+    request_size: int
+    """Size in bytes of the messages sent to the model"""
+    response_size: int
+    """Size in bytes of the response"""
+    latency: float
+    """Time in seconds spent waiting for the response"""
+    cached: bool
 
 
 class AIProvider:
-    def __init__(self) -> None:
-        pass
+    def __init__(self, wire_format: WireFormat = WireFormat.JSON) -> None:
+        self.wire_format = wire_format
+        self.system_messages: list[dict[str, Any]] = self._system_messages()
+        self.messages: list[dict[str, Any]] = list(self.system_messages)
+        self.response_cache: Optional[ResponseCache] = None
+        self.context = ContextStrategy.FULL
+        self.app: Optional[App] = None
+        """The last app received"""
+        self.turn_stats: list[TurnStats] = []
+        self._turn_started_at = 0.0
+        self._turn_cache_key: Optional[str] = None
+        self.profiler: Optional[Profiler] = None
+        """Records the time spent waiting for the model (llm) and parsing the
+        response (validation)"""
+
+    def _system_messages(self) -> list[dict[str, Any]]:
+        """The messages that start every conversation"""
+        return []
+
+    def _system_prompt(self) -> str:
+        """The instructions describing the app to respond with, in the wire format"""
+        name = "system" if self.wire_format == WireFormat.JSON else "system-compact"
+        with open(h.path_to(f"prompts/{name}")) as f:
+            return f.read()
 
     @abstractmethod
     def get_name(self) -> str:
         raise NotImplementedError
 
     @abstractmethod
-    def query(self, prompt: str) -> App:
+    def _user_message(self, content: str) -> dict[str, Any]:
+        """Build the message sent for the user `content`"""
         raise NotImplementedError
+
+    @abstractmethod
+    def _assistant_message(self, content: str) -> dict[str, Any]:
+        """Build the message recorded in the history for the model response"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def _complete(self) -> str:
+        """Send the conversation and return the text of the response"""
+        raise NotImplementedError
+
+    def _complete_stream(self) -> Iterator[str]:
+        """Send the conversation and yield the text of the response chunk by chunk.
+
+        Providers that don't support streaming return the whole response at once.
+        """
+        yield self._complete()
+
+    async def _acomplete(self) -> str:
+        """Asynchronous version of `_complete`.
+
+        Providers that don't implement it run `_complete` in a separate thread.
+        """
+        return await asyncio.to_thread(self._complete)
+
+    def _parse_app(self, content: str) -> App:
+        logging.debug(f"Result from {self.get_name()}: {content}")
+        with profiling.span(self.profiler, "validation", "App"):
+            return parse_app(content, self.wire_format)
+
+    def _get_cached_response(self) -> Optional[str]:
+        if self.response_cache is None:
+            return None
+        return self.response_cache.get(self)
+
+    def _start_turn(self, prompt: str) -> None:
+        """Add the prompt to the conversation, following the context strategy"""
+        if self.context == ContextStrategy.COMPACT and self.app is not None:
+            self.messages = list(self.system_messages)
+            current_app = encode_app(self.app, self.wire_format)
+            prompt = f"Here is the current app:\n{current_app}\n\n{prompt}"
+        self.messages.append(self._user_message(prompt))
+        self._turn_started_at = time.perf_counter()
+
+    def _record_response(self, content: str, cached: bool) -> App:
+        """Add the response to the conversation and parse it. Valid responses are
+        saved into the response cache.
+
+        Raise `InvalidAppError` if the response can't be repaired locally, the
+        caller then asks for a correction with `_correction_turn`.
+        """
+        stats = TurnStats(
+            request_size=len(json.dumps(self.messages).encode()),
+            response_size=len(content.encode()),
+            latency=time.perf_counter() - self._turn_started_at,
+            cached=cached,
+        )
+        self.turn_stats.append(stats)
+        logging.info(f"{self.get_name()} ({self.context.value} context): {stats}")
+        self._turn_cache_key = None
+        if self.response_cache is not None and not cached:
+            self._turn_cache_key = self.response_cache.key(self)
+        self.messages.append(self._assistant_message(content))
+        self.app = self._parse_app(content)
+        self._cache_response(content)
+        return self.app
+
+    def _cache_response(self, content: str) -> None:
+        if self._turn_cache_key is not None:
+            self.response_cache.put(self._turn_cache_key, content)
+
+    @contextmanager
+    def _correction_turn(self, error: InvalidAppError) -> Iterator[None]:
+        """Send only the correction prompt of the invalid response (after the system
+        messages) within this context, instead of the whole conversation"""
+        messages = self.messages
+        self.messages = [
+            *self.system_messages,
+            self._user_message(error.correction_prompt()),
+        ]
+        try:
+            with profiling.span(self.profiler, "llm", f"{self.get_name()} correction"):
+                yield
+        finally:
+            self.messages = messages
+
+    def _record_correction(self, content: str) -> App:
+        """Replace the invalid response by its correction in the conversation. The
+        correction is cached as the response of the turn."""
+        self.messages[-1] = self._assistant_message(content)
+        self.app = self._parse_app(content)
+        self._cache_response(content)
+        return self.app
+
+    def add_turn(self, prompt: str, app: App) -> None:
+        """Add a turn answered by another provider to the conversation, as if `app`
+        was the response to `prompt`"""
+        self._start_turn(prompt)
+        self.messages.append(self._assistant_message(encode_app(app, self.wire_format)))
+        self.app = app
+
+    def query(self, prompt: str) -> App:
+        """Send the prompt and return the App of the response.
+
+        A response that isn't a valid App is repaired locally when possible,
+        otherwise the model is asked once to correct it, raising `InvalidAppError`
+        if the correction isn't valid either.
+        """
+        self._start_turn(prompt)
+        content = self._get_cached_response()
+        cached = content is not None
+        if not cached:
+            with profiling.span(self.profiler, "llm", self.get_name()):
+                content = self._complete()
+        try:
+            return self._record_response(content, cached)
+        except InvalidAppError as e:
+            if cached:
+                raise
+            with self._correction_turn(e):
+                content = self._complete()
+        return self._record_correction(content)
+
+    def query_stream(
+        self, prompt: str, on_progress: Callable[[Union[Entity, Relation]], None]
+    ) -> App:
+        """Same as `query`, but the response is streamed and `on_progress` is called
+        with each entity and relation as soon as it is received."""
+        self._start_turn(prompt)
+        content = self._get_cached_response()
+        cached = content is not None
+        parser = AppStreamParser(self.wire_format)
+        chunks = []
+        with profiling.span(None if cached else self.profiler, "llm", self.get_name()):
+            for chunk in [content] if cached else self._complete_stream():
+                chunks.append(chunk)
+                for item in parser.feed(chunk):
+                    on_progress(item)
+        try:
+            return self._record_response("".join(chunks), cached)
+        except InvalidAppError as e:
+            if cached:
+                raise
+            with self._correction_turn(e):
+                content = self._complete()
+        return self._record_correction(content)
+
+    async def aquery(self, prompt: str, timeout: Optional[float] = None) -> App:
+        """Asynchronous version of `query`.
+
+        Raise `asyncio.TimeoutError` if no response is received within `timeout`
+        seconds. When the query times out or gets cancelled, the prompt is removed
+        from the conversation. Concurrent queries should use distinct providers, as
+        each provider holds a single conversation.
+        """
+        self._start_turn(prompt)
+        try:
+            content = self._get_cached_response()
+            cached = content is not None
+            if not cached:
+                with profiling.span(self.profiler, "llm", self.get_name()):
+                    content = await asyncio.wait_for(self._acomplete(), timeout)
+        except BaseException:
+            self.messages.pop()
+            raise
+        try:
+            return self._record_response(content, cached)
+        except InvalidAppError as e:
+            if cached:
+                raise
+            with self._correction_turn(e):
+                content = await asyncio.wait_for(self._acomplete(), timeout)
+        return self._record_correction(content)
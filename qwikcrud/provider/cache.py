@@ -0,0 +1,44 @@
+import json
+from typing import TYPE_CHECKING, Optional
+
+from qwikcrud.cache import DiskCache, hash_key
+
+if TYPE_CHECKING:
+    from qwikcrud.provider.base import AIProvider
+
+
+class ResponseCacheMissError(Exception):
+    """Raised in replay mode when a response is not found in the cache"""
+
+
+class ResponseCache:
+    """Store the responses of AI providers on disk.
+
+    Responses are keyed by the provider, its model and the whole conversation
+    (including the system prompt) sent to get them. In `replay` mode, a query that
+    is not in the cache raises a `ResponseCacheMissError` instead of reaching the
+    network, which makes generations reproducible offline.
+    """
+
+    def __init__(self, cache: DiskCache, replay: bool = False) -> None:
+        self.cache = cache
+        self.replay = replay
+
+    def key(self, provider: "AIProvider") -> str:
+        return hash_key(
+            type(provider).__name__,
+            provider.get_name(),
+            json.dumps(provider.messages, sort_keys=True),
+        )
+
+    def get(self, provider: "AIProvider") -> Optional[str]:
+        content = self.cache.get(self.key(provider))
+        if content is None and self.replay:
+            msg = f"No cached response of {provider.get_name()} for this conversation"
+            raise ResponseCacheMissError(msg)
+        return content
+
+    def put(self, key: str, content: str) -> None:
+        """Store the response of the conversation of `key`, computed with `key`
+        before the response is added to the conversation"""
+        self.cache.put(key, content)
@@ -1,14 +1,50 @@
+import asyncio
 import time
+from collections.abc import Iterator
+from typing import Any
 
 from qwikcrud.helpers import path_to
 from qwikcrud.provider.base import AIProvider
 from qwikcrud.schemas import App
+from qwikcrud.wire import WireFormat, encode_app
 
 
 class DummyAIProvider(AIProvider):
+    """Replay `tests/dummy.json`, in the wire format, without any network access"""
+
+    chunk_size = 64
+
+    def __init__(
+        self, delay: float = 0.1, wire_format: WireFormat = WireFormat.JSON
+    ) -> None:
+        super().__init__(wire_format)
+        self.delay = delay
+
     def get_name(self) -> str:
         return "DummyAI"
 
-    def query(self, prompt: str) -> App:  # noqa ARG002
-        time.sleep(0.1)
-        return App.model_validate_json(open(path_to("../tests/dummy.json")).read())
+    def _user_message(self, content: str) -> dict[str, Any]:
+        return {"role": "user", "content": content}
+
+    def _assistant_message(self, content: str) -> dict[str, Any]:
+        return {"role": "assistant", "content": content}
+
+    def _read_response(self) -> str:
+        with open(path_to("../tests/dummy.json")) as f:
+            content = f.read()
+        if self.wire_format == WireFormat.JSON:
+            return content
+        return encode_app(App.model_validate_json(content), self.wire_format)
+
+    def _complete(self) -> str:
+        time.sleep(self.delay)
+        return self._read_response()
+
+    async def _acomplete(self) -> str:
+        await asyncio.sleep(self.delay)
+        return self._read_response()
+
+    def _complete_stream(self) -> Iterator[str]:
+        content = self._complete()
+        for i in range(0, len(content), self.chunk_size):
+            yield content[i : i + self.chunk_size]
@@ -1,26 +1,28 @@
-import logging
+from collections.abc import Iterator
 from typing import Any
 
 import google.generativeai as genai
 
-import qwikcrud.helpers as h
+from qwikcrud.provider import http
 from qwikcrud.provider.base import AIProvider
-from qwikcrud.schemas import App
 from qwikcrud.settings import settings
+from qwikcrud.wire import WireFormat
+
+API_URL = "https://generativelanguage.googleapis.com/v1beta"
 
 
 class GoogleProvider(AIProvider):
-    def __init__(self):
-        super().__init__()
+    def __init__(self, wire_format: WireFormat = WireFormat.JSON):
+        super().__init__(wire_format)
         genai.configure(api_key=settings.google_api_key)
         self.model = genai.GenerativeModel(settings.google_model)
-        with open(h.path_to("prompts/system")) as f:
-            system_message = f.read()
-        self.messages: list[dict[str, Any]] = [
+
+    def _system_messages(self) -> list[dict[str, Any]]:
+        return [
             # Workaround for system message
             {
                 "role": "user",
-                "parts": [system_message],
+                "parts": [self._system_prompt()],
             },
             {
                 "role": "model",
@@ -34,16 +36,33 @@ class GoogleProvider(AIProvider):
     def get_name(self) -> str:
         return f"Google ({settings.google_model})"
 
-    def query(self, prompt: str) -> App:
-        self.messages.append({"role": "user", "parts": [prompt]})
-        completion = self.model.generate_content(self.messages)
-        self.messages.append(
-            {
-                "role": "model",
-                "parts": [completion.text],
-            }
-        )
-        logging.debug(f"Result from {self.get_name()}: {completion.text}")
-        return App.model_validate_json(
-            h.extract_json_from_markdown(completion.text), strict=False
+    def _user_message(self, content: str) -> dict[str, Any]:
+        return {"role": "user", "parts": [content]}
+
+    def _assistant_message(self, content: str) -> dict[str, Any]:
+        return {"role": "model", "parts": [content]}
+
+    def _complete(self) -> str:
+        return self.model.generate_content(self.messages).text
+
+    def _complete_stream(self) -> Iterator[str]:
+        for chunk in self.model.generate_content(self.messages, stream=True):
+            yield chunk.text
+
+    async def _acomplete(self) -> str:
+        response = await http.get_async_client().post(
+            f"{API_URL}/models/{settings.google_model}:generateContent",
+            params={"key": settings.google_api_key},
+            json={
+                "contents": [
+                    {
+                        "role": message["role"],
+                        "parts": [{"text": part} for part in message["parts"]],
+                    }
+                    for message in self.messages
+                ]
+            },
         )
+        response.raise_for_status()
+        parts = response.json()["candidates"][0]["content"]["parts"]
+        return "".join(part["text"] for part in parts)
@@ -0,0 +1,117 @@
+import asyncio
+import logging
+from typing import Any, Callable, Optional, Union
+
+from qwikcrud.profiling import Profiler
+from qwikcrud.provider import http
+from qwikcrud.provider.base import AIProvider
+from qwikcrud.schemas import App, Entity, Relation
+
+
+class HedgedProvider:
+    """Send the prompts to several providers and use the first valid app received.
+
+    The prompt is sent to the first provider, then to the next one whenever
+    `hedge_delay` seconds pass without a valid app or a provider fails. With a
+    `hedge_delay` of 0, the prompt is sent to all the providers at once. The other
+    queries are cancelled as soon as an app is received, and the turn is added to
+    the conversation of every provider so that the next prompts follow from it.
+    """
+
+    def __init__(self, providers: list[AIProvider], hedge_delay: float = 0) -> None:
+        self.providers = providers
+        self.hedge_delay = hedge_delay
+        self.app: Optional[App] = None
+        self.last_provider: Optional[AIProvider] = None
+        """The provider which answered the last prompt"""
+
+    @property
+    def profiler(self) -> Optional[Profiler]:
+        return self.providers[0].profiler
+
+    @profiler.setter
+    def profiler(self, profiler: Optional[Profiler]) -> None:
+        for provider in self.providers:
+            provider.profiler = profiler
+
+    def get_name(self) -> str:
+        return " + ".join(provider.get_name() for provider in self.providers)
+
+    def query(self, prompt: str) -> App:
+        async def run() -> App:
+            try:
+                return await self.aquery(prompt)
+            finally:
+                await http.close_async_client()
+
+        return asyncio.run(run())
+
+    def query_stream(
+        self, prompt: str, on_progress: Callable[[Union[Entity, Relation]], None]
+    ) -> App:
+        """Same as `query`, hedged queries aren't streamed: `on_progress` is called
+        with all the entities and relations once the app is received."""
+        app = self.query(prompt)
+        for item in [*app.entities, *app.relations]:
+            on_progress(item)
+        return app
+
+    async def aquery(self, prompt: str, timeout: Optional[float] = None) -> App:
+        """Raise the first error received when none of the providers returns a valid
+        app."""
+        states = {
+            provider: (list(provider.messages), provider.app)
+            for provider in self.providers
+        }
+        waiting = list(self.providers)
+        tasks: dict[asyncio.Task, AIProvider] = {}
+        errors: list[BaseException] = []
+
+        def hedge() -> None:
+            provider = waiting.pop(0)
+            tasks[asyncio.create_task(provider.aquery(prompt, timeout))] = provider
+
+        hedge()
+        winner: Optional[tuple[AIProvider, App]] = None
+        try:
+            while tasks and winner is None:
+                done, _ = await asyncio.wait(
+                    tasks,
+                    timeout=self.hedge_delay if waiting else None,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                for task in done:
+                    provider = tasks.pop(task)
+                    if task.exception() is None:
+                        winner = provider, task.result()
+                        break
+                    logging.warning(f"{provider.get_name()}: {task.exception()}")
+                    errors.append(task.exception())
+                if waiting and winner is None:
+                    hedge()
+        finally:
+            for task in tasks:
+                task.cancel()
+            # The cancelled queries remove their prompt from the conversation
+            await asyncio.gather(*tasks, return_exceptions=True)
+        if winner is None:
+            raise errors[0]
+        self._use_app(*winner, prompt, states)
+        return winner[1]
+
+    def _use_app(
+        self,
+        winner: AIProvider,
+        app: App,
+        prompt: str,
+        states: dict[AIProvider, tuple[list[dict[str, Any]], Optional[App]]],
+    ) -> None:
+        """Add the turn answered by `winner` to the conversation of the others, as
+        they were before the prompt"""
+        logging.info(f"{winner.get_name()} answered first")
+        self.app = app
+        self.last_provider = winner
+        for provider in self.providers:
+            if provider is not winner:
+                provider.messages, provider.app = states[provider]
+                provider.add_turn(prompt, app)
@@ -0,0 +1,34 @@
+import asyncio
+import weakref
+
+import httpx
+
+from qwikcrud.settings import settings
+
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """Return the HTTP client shared by all the providers running on the current
+    event loop, so that concurrent queries reuse a common pool of connections."""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            timeout=settings.http_timeout,
+            limits=httpx.Limits(
+                max_connections=settings.http_max_connections,
+                max_keepalive_connections=settings.http_max_connections,
+            ),
+        )
+        _clients[loop] = client
+    return client
+
+
+async def close_async_client() -> None:
+    """Close the HTTP client of the current event loop, if any"""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
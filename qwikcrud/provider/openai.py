@@ -1,47 +1,63 @@
-import logging
+from collections.abc import Iterator
 from typing import Any
 
 from openai import OpenAI
 
-from qwikcrud.helpers import path_to
+from qwikcrud.provider import http
 from qwikcrud.provider.base import AIProvider
-from qwikcrud.schemas import App
 from qwikcrud.settings import settings
+from qwikcrud.wire import WireFormat
 
 
 class OpenAIProvider(AIProvider):
-    def __init__(self):
-        super().__init__()
+    def __init__(self, wire_format: WireFormat = WireFormat.JSON):
+        super().__init__(wire_format)
         self.client = OpenAI(api_key=settings.openai_api_key)
-        with open(path_to("prompts/system")) as f:
-            system_message = f.read()
-        self.messages: list[dict[str, Any]] = [
+
+    def _system_messages(self) -> list[dict[str, Any]]:
+        return [
             {
                 "role": "system",
-                "content": system_message,
+                "content": self._system_prompt(),
             },
         ]
 
     def get_name(self) -> str:
         return f"ChatGPT ({settings.openai_model})"
 
-    def query(self, prompt: str) -> App:
-        self.messages.append({"role": "user", "content": prompt})
-        completion = self.client.chat.completions.create(
-            model=settings.openai_model,
-            response_format={"type": "json_object"},
-            messages=self.messages,
-            temperature=0.4,
-        )
-        self.messages.append(
-            {
-                "role": "assistant",
-                "content": completion.choices[0].message.content,
-            }
-        )
-        logging.debug(
-            f"Result from {self.get_name()}: {completion.choices[0].message.content}"
+    def _user_message(self, content: str) -> dict[str, Any]:
+        return {"role": "user", "content": content}
+
+    def _assistant_message(self, content: str) -> dict[str, Any]:
+        return {"role": "assistant", "content": content}
+
+    def _completion_params(self) -> dict[str, Any]:
+        return {
+            "model": settings.openai_model,
+            "response_format": {"type": "json_object"},
+            "messages": self.messages,
+            "temperature": 0.4,
+        }
+
+    def _create_completion(self, **kwargs: Any):
+        return self.client.chat.completions.create(
+            **self._completion_params(), **kwargs
         )
-        return App.model_validate_json(
-            completion.choices[0].message.content, strict=False
+
+    def _complete(self) -> str:
+        completion = self._create_completion()
+        return completion.choices[0].message.content
+
+    def _complete_stream(self) -> Iterator[str]:
+        for chunk in self._create_completion(stream=True):
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    async def _acomplete(self) -> str:
+        response = await http.get_async_client().post(
+            f"{self.client.base_url}chat/completions",
+            headers={"Authorization": f"Bearer {self.client.api_key}"},
+            json=self._completion_params(),
         )
+        response.raise_for_status()
+        return response.json()["choices"][0]["message"]["content"]
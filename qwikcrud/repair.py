@@ -0,0 +1,157 @@
+import json
+import re
+from typing import Any
+
+from pydantic import ValidationError
+
+from qwikcrud import helpers as h
+from qwikcrud.schemas import App, FieldType
+from qwikcrud.wire import WireFormat, decode_app
+
+# Types the models use instead of the field types of the system prompt
+TYPE_ALIASES: dict[str, FieldType] = {
+    "int": FieldType.Integer,
+    "bigint": FieldType.Integer,
+    "smallint": FieldType.Integer,
+    "str": FieldType.String,
+    "varchar": FieldType.String,
+    "char": FieldType.String,
+    "bool": FieldType.Boolean,
+    "double": FieldType.Float,
+    "decimal": FieldType.Float,
+    "number": FieldType.Float,
+    "timestamp": FieldType.DateTime,
+    "longtext": FieldType.Text,
+    "dict": FieldType.JSON,
+    "object": FieldType.JSON,
+}
+
+
+class InvalidAppError(ValueError):
+    """Raised when a response can't be repaired into a valid App.
+
+    `content` is the JSON of the response sent back in the correction prompt.
+    """
+
+    def __init__(self, errors: list[str], content: str) -> None:
+        super().__init__("Invalid app:\n" + "\n".join(f"- {e}" for e in errors))
+        self.errors = errors
+        self.content = content
+
+    def correction_prompt(self) -> str:
+        """A prompt asking to correct the response, which is enough on its own: the
+        rest of the conversation doesn't need to be sent again"""
+        errors = "\n".join(f"- {e}" for e in self.errors)
+        return (
+            f"This JSON is not a valid app:\n{self.content}\n\n"
+            f"Errors:\n{errors}\n\n"
+            "Reply with the whole corrected JSON only."
+        )
+
+
+def parse_app(content: str, wire_format: WireFormat = WireFormat.JSON) -> App:
+    """Parse the App of a model response, repairing its usual mistakes locally.
+
+    Raise `InvalidAppError` when the response can't be repaired. Its content is in
+    the wire format of the response.
+    """
+    text = h.extract_json_from_markdown(content)
+    try:
+        data = load_json_object(text)
+    except ValueError as e:
+        msg = f"The response is not a JSON object: {e}"
+        raise InvalidAppError([msg], text.strip()) from e
+    if wire_format == WireFormat.COMPACT:
+        content = json.dumps(data, separators=(",", ":"))
+        data = repair_app(decode_app(data))
+    else:
+        data = repair_app(data)
+        content = json.dumps(data, separators=(",", ":"))
+    try:
+        app = App.model_validate(data, strict=False)
+    except ValidationError as e:
+        errors = [
+            f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}"
+            for error in e.errors()
+        ]
+        raise InvalidAppError(errors, content) from e
+    errors = [
+        f"relations.{i}.{key}: Unknown entity {name!r}"
+        for i, relation in enumerate(app.relations)
+        for key, name in [("from", relation.from_), ("to", relation.to)]
+        if app.get_entity(name) is None
+    ]
+    if errors:
+        raise InvalidAppError(errors, content)
+    return app
+
+
+def load_json_object(text: str) -> Any:
+    """Load the first JSON object of the text, ignoring the prose around it"""
+    start = text.find("{")
+    if start == -1:
+        msg = "No JSON object found"
+        raise ValueError(msg)
+    data, _ = json.JSONDecoder().raw_decode(text, start)
+    return data
+
+
+def repair_app(data: Any) -> Any:
+    """Fix the mistakes the models usually make in the JSON of an App:
+
+    - constraints that are null or use camelCase keys;
+    - field types given as aliases (e.g. "int", "varchar");
+    - relation types written differently (e.g. "one-to-many", "OneToMany");
+    - relations referring to an entity name with a different casing;
+    - a missing "relations" key.
+
+    Anything else is left as is, for the validation to report it.
+    """
+    if not isinstance(data, dict):
+        return data
+    entities = data.get("entities")
+    if not isinstance(entities, list):
+        return data
+    for entity in entities:
+        fields = entity.get("fields") if isinstance(entity, dict) else None
+        for field in fields if isinstance(fields, list) else []:
+            if isinstance(field, dict):
+                _repair_field(field)
+    entity_names = {
+        _name_key(entity["name"]): entity["name"]
+        for entity in entities
+        if isinstance(entity, dict) and isinstance(entity.get("name"), str)
+    }
+    if data.get("relations") is None:
+        data["relations"] = []
+    for relation in data["relations"] if isinstance(data["relations"], list) else []:
+        if isinstance(relation, dict):
+            _repair_relation(relation, entity_names)
+    return data
+
+
+def _repair_field(field: dict[str, Any]) -> None:
+    constraints = field.get("constraints")
+    if not isinstance(constraints, dict):
+        field["constraints"] = {}
+    else:
+        field["constraints"] = {h.snake_case(k): v for k, v in constraints.items()}
+    type_ = field.get("type")
+    if isinstance(type_, str) and type_.lower() in TYPE_ALIASES:
+        field["type"] = TYPE_ALIASES[type_.lower()].value
+
+
+def _repair_relation(relation: dict[str, Any], entity_names: dict[str, str]) -> None:
+    type_ = relation.get("type")
+    if isinstance(type_, str):
+        type_ = re.sub(r"(?<=[a-z])(?=[A-Z])", "_", type_.strip())
+        relation["type"] = re.sub(r"[\s-]+", "_", type_).upper()
+    for key in ("from", "to"):
+        name = relation.get(key)
+        if isinstance(name, str):
+            relation[key] = entity_names.get(_name_key(name), name)
+
+
+def _name_key(name: str) -> str:
+    """The entity names that are considered the same have the same key"""
+    return re.sub(r"[\W_]", "", name).lower()
@@ -1,7 +1,7 @@
 from enum import Enum
 from typing import Any, Optional
 
-from pydantic import BaseModel, Field, model_validator
+from pydantic import BaseModel, Field, PrivateAttr, model_validator
 from rich.console import Console
 from rich.tree import Tree
 
@@ -69,6 +69,15 @@ class RelationType(str, Enum):
         return None
 
 
+def _python_literal(value: Any) -> str:
+    """The representation of a constraint value, written the way black writes it"""
+    if isinstance(value, list):
+        return f"[{', '.join(_python_literal(v) for v in value)}]"
+    if isinstance(value, str) and not any(c in value for c in "\"'\\"):
+        return f'"{value}"'
+    return repr(value)
+
+
 class Constraints(BaseModel):
     unique: Optional[bool] = Field(None)
     not_null: Optional[bool] = Field(None)
@@ -102,6 +111,10 @@ class FieldModel(BaseModel):
     def is_file(self):
         return self.type_ in (FieldType.Image, FieldType.File)
 
+    def is_sortable(self):
+        """Whether the list endpoint can sort the objects by this field"""
+        return not (self.is_file() or self.type_ == FieldType.JSON)
+
     def sqla_column_def(self) -> str:
         """Generate the sqlalchemy column definition
 
@@ -118,19 +131,19 @@ class FieldModel(BaseModel):
             )
             file_field_mapping_kwargs = []
             if self.type_ == FieldType.Image:
-                file_field_mapping_kwargs.append("thumbnail_size=(150,150)")
+                file_field_mapping_kwargs.append("thumbnail_size=(150, 150)")
             file_field_validators = ['SizeValidator(max_size="20M")']
             if self.constraints.mime_types:
-                mimetypes_list = ",".join(
+                mimetypes_list = ", ".join(
                     ('"' + v + '"') for v in self.constraints.mime_types
                 )
                 file_field_validators.append(
                     f"ContentTypeValidator([{mimetypes_list}])"
                 )
             file_field_mapping_kwargs.append(
-                f'validators=[{",".join(file_field_validators)}]'
+                f'validators=[{", ".join(file_field_validators)}]'
             )
-            file_field_mapping += f'({",".join(file_field_mapping_kwargs)})'
+            file_field_mapping += f'({", ".join(file_field_mapping_kwargs)})'
             mapped_column_kwargs.append(file_field_mapping)
         if self.type_ == FieldType.Enum:
             mapped_column_kwargs.append(f"Enum({self.name.capitalize()})")
@@ -139,7 +152,7 @@ class FieldModel(BaseModel):
         if self.type_ == FieldType.ID:
             mapped_column_kwargs.append("primary_key=True")
         return f"{h.snake_case(self.name)}: Mapped[{type_mapping}]" + (
-            f'=mapped_column({",".join(mapped_column_kwargs)})'
+            f' = mapped_column({", ".join(mapped_column_kwargs)})'
             if len(mapped_column_kwargs) > 0
             else ""
         )
@@ -153,7 +166,7 @@ class FieldModel(BaseModel):
         if self.is_file():
             type_mapping = "Optional[FileInfo]"
         pydantic_field_kwargs = [
-            f"{k}={v}"
+            f"{k}={_python_literal(v)}"
             for (k, v) in self.constraints.model_dump(
                 exclude={"unique", "not_null", "allowed_values"}, exclude_none=True
             ).items()
@@ -162,7 +175,7 @@ class FieldModel(BaseModel):
             pydantic_field_kwargs = ["None", *pydantic_field_kwargs]
 
         return f"{h.snake_case(self.name)}: {type_mapping}" + (
-            f'=Field({",".join(pydantic_field_kwargs)})'
+            f' = Field({", ".join(pydantic_field_kwargs)})'
             if len(pydantic_field_kwargs) > 0
             else ""
         )
@@ -216,19 +229,63 @@ class App(BaseModel):
     entities: list[Entity] = Field(...)
     relations: list[Relation] = Field(...)
 
+    # Indexes used by the templates, built once by `reindex`
+    _entities_by_name: dict[str, Entity] = PrivateAttr(default_factory=dict)
+    _relations_by_entity: dict[str, list[Relation]] = PrivateAttr(default_factory=dict)
+    _file_fields: list[FieldModel] = PrivateAttr(default_factory=list)
+    _enum_fields: list[FieldModel] = PrivateAttr(default_factory=list)
+
+    def model_post_init(self, __context: Any) -> None:
+        self.reindex()
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        super().__setattr__(name, value)
+        if name in ("entities", "relations"):
+            self.reindex()
+
+    def reindex(self) -> None:
+        """Rebuild the indexes of the entities, relations and fields.
+
+        This is done automatically after validation and when `entities` or
+        `relations` are reassigned, but must be called after mutating them in place
+        (e.g. renaming a field).
+        """
+        self._entities_by_name = {entity.name: entity for entity in self.entities}
+        self._relations_by_entity = {entity.name: [] for entity in self.entities}
+        for relation in self.relations:
+            for name in dict.fromkeys((relation.from_, relation.to)):
+                self._relations_by_entity.setdefault(name, []).append(relation)
+        fields = [field for entity in self.entities for field in entity.fields]
+        self._file_fields = [field for field in fields if field.is_file()]
+        self._enum_fields = [field for field in fields if field.type_ == FieldType.Enum]
+
+    def get_entity(self, name: str) -> Optional[Entity]:
+        return self._entities_by_name.get(name)
+
+    def relations_of(self, entity_name: str) -> list[Relation]:
+        """The relations the entity is part of, on either side"""
+        return self._relations_by_entity.get(entity_name, [])
+
+    def related_entities(self, entity_name: str) -> list[str]:
+        """The names of the other entities the entity shares a relation with"""
+        names = (
+            name
+            for relation in self.relations_of(entity_name)
+            for name in (relation.from_, relation.to)
+        )
+        return [name for name in dict.fromkeys(names) if name != entity_name]
+
+    def file_fields(self) -> list[FieldModel]:
+        return self._file_fields
+
+    def enum_fields(self) -> list[FieldModel]:
+        return self._enum_fields
+
     def has_file(self) -> bool:
-        for entity in self.entities:
-            for field in entity.fields:
-                if field.is_file():
-                    return True
-        return False
+        return len(self._file_fields) > 0
 
     def has_enum(self) -> bool:
-        for entity in self.entities:
-            for field in entity.fields:
-                if field.type_ == FieldType.Enum:
-                    return True
-        return False
+        return len(self._enum_fields) > 0
 
     def summary(self):
         console = Console()
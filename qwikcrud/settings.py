@@ -1,3 +1,4 @@
+from pathlib import Path
 from typing import Optional
 
 from pydantic import Field
@@ -13,5 +14,13 @@ class Settings(BaseSettings):
 
     logging_level: str = "ERROR"
 
+    http_timeout: float = 120
+    http_max_connections: int = 20
+
+    cache_dir: Path = Path.home() / ".cache" / "qwikcrud"
+    format_cache_max_size: int = 64 * 1024 * 1024
+    response_cache_max_size: int = 16 * 1024 * 1024
+    response_cache_ttl: float = 30 * 24 * 60 * 60
+
 
 settings = Settings()
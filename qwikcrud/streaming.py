@@ -0,0 +1,94 @@
+import json
+from typing import Any, Callable, Optional, Union
+
+from qwikcrud.schemas import Entity, Relation
+from qwikcrud.wire import WireFormat, decode_entity, decode_relation
+
+# How to validate the items of each list of the root object, by wire format
+_ITEM_VALIDATORS: dict[
+    WireFormat, dict[str, Callable[[Any], Union[Entity, Relation]]]
+] = {
+    WireFormat.JSON: {
+        "entities": Entity.model_validate,
+        "relations": Relation.model_validate,
+    },
+    WireFormat.COMPACT: {
+        "e": lambda item: Entity.model_validate(decode_entity(item)),
+        "r": lambda item: Relation.model_validate(decode_relation(item)),
+    },
+}
+
+
+class AppStreamParser:
+    """Incrementally parse the JSON of an App, in `wire_format`, as it is received.
+
+    Chunks of text are passed to `feed`, which returns the entities and relations
+    whose JSON value got completed by the chunk. Anything before the root object
+    (e.g. the opening of a markdown code block) or after it is ignored. Items that
+    are not valid are skipped, the validation of the whole App reports them.
+
+    Example:
+        parser = AppStreamParser()
+        for chunk in chunks:
+            for item in parser.feed(chunk):
+                print(item.name)
+    """
+
+    def __init__(self, wire_format: WireFormat = WireFormat.JSON) -> None:
+        self._validators = _ITEM_VALIDATORS[wire_format]
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._string: list[str] = []
+        self._last_string = ""
+        self._key: Optional[str] = None
+        self._item: Optional[list[str]] = None
+
+    def feed(self, chunk: str) -> list[Union[Entity, Relation]]:
+        items = []
+        for char in chunk:
+            item = self._feed_char(char)
+            if item is not None:
+                items.append(item)
+        return items
+
+    def _feed_char(self, char: str) -> Optional[Union[Entity, Relation]]:
+        if self._item is not None:
+            self._item.append(char)
+        if self._in_string:
+            self._feed_string_char(char)
+        elif char == '"':
+            self._in_string = True
+            self._string = []
+        elif char in "{[":
+            self._depth += 1
+            if self._depth == 3 and self._key in self._validators:
+                self._item = [char]
+        elif char in "}]":
+            self._depth -= 1
+            if self._depth == 2 and self._item is not None:
+                return self._complete_item()
+        elif char == ":" and self._depth == 1:
+            # The last string read at the root level is the key of this value
+            self._key = self._last_string
+        return None
+
+    def _feed_string_char(self, char: str) -> None:
+        if self._escaped:
+            self._escaped = False
+        elif char == "\\":
+            self._escaped = True
+        elif char == '"':
+            self._in_string = False
+            if self._depth == 1:
+                self._last_string = "".join(self._string)
+            return
+        if self._depth == 1:
+            self._string.append(char)
+
+    def _complete_item(self) -> Optional[Union[Entity, Relation]]:
+        text, self._item = "".join(self._item), None
+        try:
+            return self._validators[self._key](json.loads(text))
+        except ValueError:
+            return None
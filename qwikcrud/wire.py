@@ -0,0 +1,146 @@
+import json
+from enum import Enum
+from typing import Any
+
+from qwikcrud.schemas import App, Constraints, FieldModel, Relation
+
+
+class WireFormat(str, Enum):
+    """How the model writes the app in its responses"""
+
+    # The App schema as is
+    JSON = "json"
+    # JSON with short keys, and arrays for the entities, fields and relations
+    COMPACT = "compact"
+
+
+ROOT_KEYS = {"n": "name", "d": "description", "e": "entities", "r": "relations"}
+CONSTRAINT_KEYS = {
+    "u": "unique",
+    "nn": "not_null",
+    "gt": "gt",
+    "ge": "ge",
+    "lt": "lt",
+    "le": "le",
+    "mo": "multiple_of",
+    "mn": "min_length",
+    "mx": "max_length",
+    "mt": "mime_types",
+    "av": "allowed_values",
+}
+RELATION_TYPES = {
+    "11": "ONE_TO_ONE",
+    "1N": "ONE_TO_MANY",
+    "NN": "MANY_TO_MANY",
+}
+RELATION_KEYS = ["name", "type", "from", "to", "field_name", "backref_field_name"]
+
+
+def decode_app(data: Any) -> Any:
+    """Convert an app of the compact format into the JSON of the App schema.
+
+    Anything that doesn't have the expected shape is left as is, for the validation
+    to report it.
+
+    Example:
+        {"n":"Blog","d":"A blog","e":[["Post",[["id","ID"],["title","String",
+        {"mx":100}]]]],"r":[["User_Posts","1N","User","Post","posts","author"]]}
+    """
+    data = _decode_keys(data, ROOT_KEYS)
+    if isinstance(data, dict):
+        if isinstance(data.get("entities"), list):
+            data["entities"] = [decode_entity(item) for item in data["entities"]]
+        if isinstance(data.get("relations"), list):
+            data["relations"] = [decode_relation(item) for item in data["relations"]]
+    return data
+
+
+def decode_entity(item: Any) -> Any:
+    """[name, [field, ...]] where a field is [name, type] or [name, type,
+    constraints]"""
+    if not isinstance(item, list) or len(item) != 2:
+        return item
+    name, fields = item
+    if isinstance(fields, list):
+        fields = [_decode_field(field) for field in fields]
+    return {"name": name, "fields": fields}
+
+
+def decode_relation(item: Any) -> Any:
+    """[name, type, from, to, field_name, backref_field_name]
+
+    A many to one relation ("N1"), which the App schema doesn't have, is decoded as
+    the one to many relation seen from the other side.
+    """
+    if not isinstance(item, list) or len(item) != len(RELATION_KEYS):
+        return item
+    relation = dict(zip(RELATION_KEYS, item))
+    type_ = relation["type"]
+    if str(type_).upper() == "N1":
+        return {
+            **relation,
+            "type": "ONE_TO_MANY",
+            "from": relation["to"],
+            "to": relation["from"],
+            "field_name": relation["backref_field_name"],
+            "backref_field_name": relation["field_name"],
+        }
+    relation["type"] = RELATION_TYPES.get(str(type_).upper(), type_)
+    return relation
+
+
+def _decode_field(item: Any) -> Any:
+    if not isinstance(item, list) or len(item) not in (2, 3):
+        return item
+    field = {"name": item[0], "type": item[1]}
+    if len(item) == 3:
+        field["constraints"] = _decode_keys(item[2], CONSTRAINT_KEYS)
+    return field
+
+
+def _decode_keys(data: Any, keys: dict[str, str]) -> Any:
+    if not isinstance(data, dict):
+        return data
+    return {keys.get(key, key): value for key, value in data.items()}
+
+
+def encode_app(app: App, wire_format: WireFormat) -> str:
+    """The JSON of the app in the wire format, as the model would write it"""
+    if wire_format == WireFormat.JSON:
+        return app.model_dump_json(by_alias=True, exclude_defaults=True)
+    data = {
+        "n": app.name,
+        "d": app.description,
+        "e": [
+            [entity.name, [_encode_field(field) for field in entity.fields]]
+            for entity in app.entities
+        ],
+        "r": [_encode_relation(relation) for relation in app.relations],
+    }
+    return json.dumps(data, separators=(",", ":"))
+
+
+def _encode_field(field: FieldModel) -> list[Any]:
+    short_keys = {key: short for short, key in CONSTRAINT_KEYS.items()}
+    values = (field.constraints or Constraints()).model_dump(exclude_none=True)
+    constraints = {
+        # 0 is shorter than 0.0
+        short_keys[key]: int(value)
+        if isinstance(value, float) and value.is_integer()
+        else value
+        for key, value in values.items()
+    }
+    encoded = [field.name, field.type_.value]
+    return [*encoded, constraints] if constraints else encoded
+
+
+def _encode_relation(relation: Relation) -> list[str]:
+    short_types = {type_: short for short, type_ in RELATION_TYPES.items()}
+    return [
+        relation.name,
+        short_types[relation.type_.value],
+        relation.from_,
+        relation.to,
+        relation.field_name,
+        relation.backref_field_name,
+    ]
@@ -1,8 +1,41 @@
 from pathlib import Path
 
-from qwikcrud.schemas import App
+from qwikcrud import helpers as h
+from qwikcrud.schemas import App, FieldModel, FieldType
 
 
 def test_validate():
     with open(Path(__file__).parent / "dummy.json") as f:
         App.model_validate_json(f.read())
+
+
+def load_app() -> App:
+    with open(Path(__file__).parent / "dummy.json") as f:
+        return App.model_validate_json(f.read())
+
+
+def test_indexes():
+    app = load_app()
+    assert app.get_entity("Product").name == "Product"
+    assert [r.name for r in app.relations_of("Product")] == [
+        "User_Products",
+        "Product_Orders",
+    ]
+    assert app.relations_of("Address")[0].name == "User_Address"
+    assert [f.name for f in app.file_fields()] == ["avatar", "image"]
+    assert app.has_file()
+    assert not app.has_enum()
+
+
+def test_indexes_are_rebuilt():
+    app = load_app()
+    app.entities = [e for e in app.entities if e.name != "Order"]
+    assert app.get_entity("Order") is None
+
+    app.entities[0].name = "Customer"
+    app.relations[0].from_ = "Customer"
+    app.entities[0].fields.append(FieldModel(name="accountStatus", type=FieldType.Enum))
+    h.apply_python_naming_convention(app)
+    assert app.get_entity("Customer") is not None
+    assert app.relations_of("Customer")[0].name == "User_Address"
+    assert [f.name for f in app.enum_fields()] == ["account_status"]
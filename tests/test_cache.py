@@ -0,0 +1,35 @@
+import os
+from pathlib import Path
+
+from qwikcrud.cache import DiskCache, hash_key
+
+
+def test_get_and_put(tmp_path: Path):
+    cache = DiskCache(tmp_path, max_size=1024)
+    key = hash_key("black=23.11.0", "x = 1")
+    assert cache.get(key) is None
+    cache.put(key, "x = 1\n")
+    assert cache.get(key) == "x = 1\n"
+    assert hash_key("black=23.12.0", "x = 1") != key
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path: Path):
+    cache = DiskCache(tmp_path, max_size=300)
+    for i, key in enumerate(("a", "b", "c")):
+        cache.put(hash_key(key), key * 100)
+        os.utime(cache._path(hash_key(key)), (i, i))
+    assert cache.get(hash_key("a")) is not None  # "a" becomes the most recently used
+    cache.put(hash_key("d"), "d" * 100)
+    assert cache.get(hash_key("b")) is None
+    assert cache.get(hash_key("a")) is not None
+    assert cache.get(hash_key("d")) is not None
+    assert cache.get(hash_key("c")) is not None
+
+
+def test_expired_entries_are_ignored(tmp_path: Path):
+    cache = DiskCache(tmp_path, max_size=1024, ttl=60)
+    cache.put(hash_key("a"), "a")
+    cache.put(hash_key("b"), "b")
+    os.utime(cache._path(hash_key("a")), (0, 0))
+    assert cache.get(hash_key("a")) is None
+    assert cache.get(hash_key("b")) == "b"
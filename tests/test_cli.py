@@ -0,0 +1,114 @@
+import json
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+from click.testing import CliRunner
+
+from qwikcrud.batch import spec_output_directories
+from qwikcrud.cache import DiskCache
+from qwikcrud.cli import main
+from qwikcrud.provider.cache import ResponseCache
+from qwikcrud.provider.google import GoogleProvider
+from qwikcrud.settings import settings
+
+DUMMY_JSON = Path(__file__).parent / "dummy.json"
+EXAMPLES = Path(__file__).parent.parent / "examples/fastapi"
+TASK_MANAGEMENT_LOCK = EXAMPLES / "task-management/generated/openai/.qwikcrud.json.lock"
+
+# Generous budget: importing the CLI used to take several times longer when the
+# AI SDKs and the formatters were imported eagerly.
+IMPORT_TIME_BUDGET = 1.5
+
+SLOW_MODULES = ["openai", "google.generativeai", "black", "isort", "autoflake"]
+
+
+def test_cli_import_cost():
+    code = (
+        "import json, sys, time;"
+        "start = time.perf_counter();"
+        "import qwikcrud.cli;"
+        "duration = time.perf_counter() - start;"
+        f"print(json.dumps([duration, [m for m in {SLOW_MODULES!r} if m in sys.modules]]))"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code],  # noqa: S603
+        capture_output=True,
+        check=True,
+        text=True,
+    ).stdout
+    duration, imported_slow_modules = json.loads(output)
+    assert imported_slow_modules == []
+    assert duration < IMPORT_TIME_BUDGET
+
+
+def test_batch(tmp_path: Path):
+    specs = tmp_path / "specs"
+    specs.mkdir()
+    shutil.copy(DUMMY_JSON, specs / "shop.json")
+    shutil.copy(TASK_MANAGEMENT_LOCK, specs / "tasks.json")
+    (specs / "broken.json").write_text("{}")
+
+    result = CliRunner().invoke(
+        main, ["batch", str(specs), "-o", str(tmp_path / "out"), "-j", "2"]
+    )
+
+    assert result.exit_code == 1
+    assert "shop.json" in result.output
+    assert "broken.json: ValidationError" in result.output
+    assert (tmp_path / "out/shop/app/endpoints/product.py").exists()
+    assert (tmp_path / "out/tasks/app/endpoints/task.py").exists()
+    assert not (tmp_path / "out/broken").exists()
+
+
+def test_batch_specs_with_the_same_name(tmp_path: Path):
+    specs = tmp_path / "specs"
+    specs.mkdir()
+    shutil.copy(DUMMY_JSON, specs / "shop.v1.json")
+    shutil.copy(DUMMY_JSON, specs / "shop.v2.json")
+    (specs / "shop.txt").write_text("A shop")
+    shutil.copy(DUMMY_JSON, specs / "shop.json")
+
+    result = CliRunner().invoke(
+        main, ["batch", str(specs), "-o", str(tmp_path / "out")]
+    )
+
+    assert result.exit_code == 2
+    assert "same directory: shop.json, shop.txt" in result.output
+    assert not (tmp_path / "out").exists()
+    directories = spec_output_directories(
+        [specs / "shop.v1.json", specs / "shop.v2.json"], specs, tmp_path
+    )
+    assert [path.name for path in directories.values()] == ["shop.v1", "shop.v2"]
+
+
+def test_batch_examples(tmp_path: Path, monkeypatch):
+    # Replay the response of the example prompt instead of asking Google
+    monkeypatch.setattr(settings, "cache_dir", tmp_path / "cache")
+    provider = GoogleProvider()
+    provider._start_turn(EXAMPLES.joinpath("task-management/prompt").read_text())
+    cache = ResponseCache(
+        DiskCache(tmp_path / "cache/responses", settings.response_cache_max_size)
+    )
+    cache.put(cache.key(provider), TASK_MANAGEMENT_LOCK.read_text())
+
+    result = CliRunner().invoke(
+        main, ["batch", str(EXAMPLES), "-o", str(tmp_path / "out"), "--replay"]
+    )
+
+    assert result.exit_code == 0, result.output
+    assert "task-management/prompt" in result.output
+    assert (tmp_path / "out/task-management/app/endpoints/task.py").exists()
+
+
+def test_batch_without_specs(tmp_path: Path):
+    (tmp_path / "specs/app").mkdir(parents=True)
+    (tmp_path / "specs/app/notes.txt").write_text("Not a spec")
+
+    result = CliRunner().invoke(
+        main, ["batch", str(tmp_path / "specs"), "-o", str(tmp_path / "out")]
+    )
+
+    assert result.exit_code == 2
+    assert "No spec found" in result.output
@@ -0,0 +1,169 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from qwikcrud import generator
+from qwikcrud.formatting import (
+    MAX_LINE_LENGTH,
+    fast_format_python_code,
+    fit_lines,
+    remove_unused_imports,
+)
+from qwikcrud.generator import (
+    LOCK_FILE,
+    LOCK_OPTIONS_KEY,
+    FastAPIAppGenerator,
+    Layout,
+    format_python_code,
+)
+from qwikcrud.schemas import App, Constraints, Entity, FieldModel, Relation
+
+ROOT = Path(__file__).parent.parent
+EXAMPLES = ROOT / "examples/fastapi/task-management/generated"
+SPECS = [
+    Path(__file__).parent / "dummy.json",
+    EXAMPLES / "openai/.qwikcrud.json.lock",
+    EXAMPLES / "gemini-pro/.qwikcrud.json.lock",
+]
+
+
+def read_tree(directory: Path) -> dict[str, str]:
+    tree = {
+        str(path.relative_to(directory)): path.read_text()
+        for path in sorted(directory.rglob("*"))
+        if path.is_file()
+    }
+    # Without the options recorded in the lock file
+    lock = json.loads(tree[LOCK_FILE])
+    del lock[LOCK_OPTIONS_KEY]
+    tree[LOCK_FILE] = json.dumps(lock)
+    return tree
+
+
+def long_names_app() -> App:
+    """An app whose names make many lines of the generated code too long"""
+    name = "VeryLongEntityNameForTheFormattingOfTheGeneratedCode"
+    return App(
+        name="Long names",
+        description="An app with long names",
+        entities=[
+            Entity(
+                name=f"{name}{i}",
+                fields=[
+                    FieldModel(name="id", type="ID"),
+                    FieldModel(
+                        name="a_very_long_field_name_that_makes_the_lines_too_long",
+                        type="String",
+                        constraints=Constraints(
+                            unique=True, not_null=True, min_length=1, max_length=50
+                        ),
+                    ),
+                    FieldModel(
+                        name="attachment_with_a_long_name",
+                        type="Image",
+                        constraints=Constraints(
+                            mime_types=["image/png", "image/jpeg", "image/webp"]
+                        ),
+                    ),
+                    FieldModel(
+                        name="status_with_a_long_name",
+                        type="Enum",
+                        constraints=Constraints(allowed_values=["draft", "published"]),
+                    ),
+                ],
+            )
+            for i in range(3)
+        ],
+        relations=[
+            Relation(
+                name=f"{name}{i}{name}{j}",
+                type=relation_type,
+                to=f"{name}{j}",
+                field_name=f"related_records_with_a_long_name_{j}",
+                backref_field_name=f"owner_record_with_a_long_name_{i}",
+                **{"from": f"{name}{i}"},
+            )
+            for i, j, relation_type in [
+                (0, 1, "ONE_TO_MANY"),
+                (1, 2, "MANY_TO_MANY"),
+                (2, 0, "ONE_TO_ONE"),
+            ]
+        ],
+    )
+
+
+@pytest.mark.parametrize("async_db", [False, True], ids=["sync", "async"])
+@pytest.mark.parametrize("layout", list(Layout))
+@pytest.mark.parametrize(
+    ("app", "fallback"),
+    [
+        *((App.model_validate_json(spec.read_text()), False) for spec in SPECS),
+        # Some lines are still too long once split, those files fall back
+        (long_names_app(), True),
+    ],
+    ids=["dummy", "openai", "gemini-pro", "long-names"],
+)
+def test_fast_format_matches_formatters(
+    tmp_path: Path,
+    monkeypatch,
+    app: App,
+    fallback: bool,
+    layout: Layout,
+    async_db: bool,
+):
+    FastAPIAppGenerator(tmp_path / "full", layout=layout, async_db=async_db).generate(
+        app
+    )
+
+    def fail(code_text: str) -> str:
+        msg = f"The fast path isn't used for:\n{code_text}"
+        raise AssertionError(msg)
+
+    if not fallback:
+        monkeypatch.setattr(generator, "format_python_code", fail)
+    FastAPIAppGenerator(
+        tmp_path / "fast", layout=layout, fast_format=True, async_db=async_db
+    ).generate(app)
+    assert read_tree(tmp_path / "fast") == read_tree(tmp_path / "full")
+
+
+@pytest.mark.parametrize(
+    "code_text",
+    [
+        "x_with_a_long_name = some_function(the_first_argument_value, the_second_argument_value_x)\n",
+        "def function_with_a_long_name(*, first_parameter: int, second_parameter: str) -> Optional[int]:\n"
+        "    pass\n",
+        "items = [the_first_element_of_the_list, the_second_element_of_the_list, the_third_element]\n",
+        "value = await crud.some_entity_with_a_long_name.get_or_404(database, the_identifier_value)\n",
+        "value = some_function(argument_value, function_with_a_long_name(the_argument_value, 1, 2))\n",
+        "class ClassWithAVeryLongName(BaseClassWithAVeryLongName, AnotherBaseClassWithAVeryLongName):\n"
+        "    pass\n",
+        'description_of_the_app: str = "A string that is too long to fit on the same line as its name"\n',
+        'description: str = "%s"\n' % ("A string that needs several lines. " * 5),
+    ],
+)
+def test_fit_lines(code_text: str):
+    fitted = fit_lines(code_text)
+    assert fitted != code_text
+    assert all(len(line) <= MAX_LINE_LENGTH for line in fitted.splitlines())
+    assert fitted == format_python_code(fitted)
+
+
+def test_too_long_lines_fall_back():
+    operator = " + ".join(f"value_{i}" for i in range(20))
+    assert fast_format_python_code(f"x = function({operator})\n") is None
+    comment = "# A comment longer than the line length. " * 3
+    assert fast_format_python_code(f"x = function(argument)  {comment}\n") is None
+    assert fast_format_python_code(f"{comment}\nx = 1\n") is not None
+
+
+def test_remove_unused_imports():
+    code_text = (
+        "import os\nimport sys as system\nfrom typing import Any, Optional\n\n"
+        "print(system.argv, Optional)\n"
+    )
+    assert remove_unused_imports(code_text) == (
+        "import sys as system\nfrom typing import Optional\n\n"
+        "print(system.argv, Optional)\n"
+    )
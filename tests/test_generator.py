@@ -0,0 +1,454 @@
+import io
+import os
+import sys
+import tarfile
+import zipfile
+from pathlib import Path
+from typing import Optional
+from unittest.mock import Mock
+
+import pytest
+
+from qwikcrud import generator
+from qwikcrud.cache import DiskCache
+from qwikcrud.generator import FastAPIAppGenerator, Layout
+from qwikcrud.profiling import Profiler
+from qwikcrud.schemas import App, FieldModel, FieldType
+
+
+def load_app() -> App:
+    with open(Path(__file__).parent / "dummy.json") as f:
+        return App.model_validate_json(f.read())
+
+
+def read_tree(directory: Path) -> dict[str, str]:
+    return {
+        str(path.relative_to(directory)): path.read_text()
+        for path in sorted(directory.rglob("*"))
+        if path.is_file()
+    }
+
+
+def test_generate(tmp_path: Path):
+    FastAPIAppGenerator(tmp_path).generate(load_app())
+    tree = read_tree(tmp_path)
+    assert "app/models.py" in tree
+    assert "app/endpoints/user.py" in tree
+    assert "class User(Base):" in tree["app/models.py"]
+    assert '@event.listens_for(engine, "connect")' in tree["app/db.py"]
+    assert '"journal_mode": "WAL"' in tree["app/settings.py"]
+    # The list endpoint sorts by any field but the files (avatar)
+    assert (
+        '"last_name",\n        "bio",\n    ] = "id",' in tree["app/endpoints/user.py"]
+    )
+
+
+def test_per_entity_layout(tmp_path: Path):
+    FastAPIAppGenerator(tmp_path).generate(load_app())
+    FastAPIAppGenerator(tmp_path, layout=Layout.PER_ENTITY).generate(load_app())
+    tree = read_tree(tmp_path)
+    assert "app/models.py" not in tree
+    assert "app/crud.py" not in tree
+    assert "from app.models.user import User" in tree["app/models/__init__.py"]
+    assert "order = CRUDOrder(Order)" in tree["app/crud/crud_order.py"]
+    assert "class UserOut(BaseModel):" in tree["app/schemas/user.py"]
+    # The related models are only imported for type checking
+    assert "if TYPE_CHECKING:\n    from app.models.address import Address" in (
+        tree["app/models/user.py"]
+    )
+    assert "class Address(" not in tree["app/models/user.py"]
+
+
+def test_async_db(tmp_path: Path):
+    FastAPIAppGenerator(tmp_path, async_db=True).generate(load_app())
+    tree = read_tree(tmp_path)
+    assert "engine = create_async_engine(" in tree["app/db.py"]
+    assert "SessionDep = Annotated[AsyncSession, Depends(get_db)]" in (
+        tree["app/deps.py"]
+    )
+    assert "await db.commit()" in tree["app/crud.py"]
+    assert "sqlite+aiosqlite:///" in tree["app/settings.py"]
+    assert "aiosqlite" in tree["requirements.txt"]
+    # The relationships are loaded along with the objects instead of lazy loaded
+    assert 'product = await crud.product.get_or_404(db, id, load=["user"])' in (
+        tree["app/endpoints/product.py"]
+    )
+    for path, code_text in tree.items():
+        if path.endswith(".py"):
+            compile(code_text, path, "exec")
+
+
+def test_parallel_generation_matches_serial(tmp_path: Path):
+    FastAPIAppGenerator(tmp_path / "serial").generate(load_app())
+    FastAPIAppGenerator(tmp_path / "parallel", jobs=2).generate(load_app())
+    assert read_tree(tmp_path / "serial") == read_tree(tmp_path / "parallel")
+
+
+def test_incremental_generation_rewrites_affected_files_only(tmp_path: Path):
+    generator = FastAPIAppGenerator(tmp_path)
+    generator.generate(load_app())
+    for path in tmp_path.rglob("*"):
+        os.utime(path, (0, 0))
+
+    app = load_app()
+    app.entities[0].fields.append(FieldModel(name="resume", type=FieldType.File))
+    app.entities = [e for e in app.entities if e.name != "Order"]
+    app.relations = [r for r in app.relations if "Order" not in (r.from_, r.to)]
+    generator.generate(app, incremental=True)
+
+    rewritten = {
+        str(path.relative_to(tmp_path))
+        for path in tmp_path.rglob("*")
+        if path.is_file() and path.stat().st_mtime != 0
+    }
+    assert rewritten == {
+        ".qwikcrud.json.lock",
+        "app/models.py",
+        "app/schemas.py",
+        "app/admin.py",
+        "app/crud.py",
+        "app/main.py",
+        "app/endpoints/user.py",
+        "app/endpoints/product.py",
+    }
+    assert not (tmp_path / "app/endpoints/order.py").exists()
+    assert "set_resume" in (tmp_path / "app/endpoints/user.py").read_text()
+
+
+def test_incremental_generation_with_other_options_rewrites_everything(
+    tmp_path: Path, monkeypatch
+):
+    FastAPIAppGenerator(tmp_path / "app").generate(load_app())
+    FastAPIAppGenerator(tmp_path / "app", async_db=True).generate(
+        load_app(), incremental=True
+    )
+    FastAPIAppGenerator(tmp_path / "expected", async_db=True).generate(load_app())
+    assert read_tree(tmp_path / "app") == read_tree(tmp_path / "expected")
+    # The lock is still a valid app spec
+    App.model_validate_json((tmp_path / "app/.qwikcrud.json.lock").read_text())
+
+    # Another version of qwikcrud
+    (tmp_path / "app/app/db.py").write_text("")
+    monkeypatch.setattr(generator, "__version__", "0.0.0")
+    FastAPIAppGenerator(tmp_path / "app", async_db=True).generate(
+        load_app(), incremental=True
+    )
+    assert read_tree(tmp_path / "app") != read_tree(tmp_path / "expected")
+    assert (tmp_path / "app/app/db.py").read_text() == (
+        tmp_path / "expected/app/db.py"
+    ).read_text()
+
+
+def test_failed_generation_keeps_previous_app(tmp_path: Path, monkeypatch):
+    FastAPIAppGenerator(tmp_path).generate(load_app())
+    previous_tree = read_tree(tmp_path)
+
+    def format_python_code(code_text: str) -> str:
+        if "class Order" in code_text:
+            msg = "invalid code"
+            raise SyntaxError(msg)
+        return code_text
+
+    monkeypatch.setattr(generator, "format_python_code", format_python_code)
+    app = load_app()
+    app.name = "Another app"
+    with pytest.raises(SyntaxError):
+        FastAPIAppGenerator(tmp_path).generate(app)
+    assert read_tree(tmp_path) == previous_tree
+    assert sorted(p.name for p in tmp_path.iterdir() if p.name.startswith(".")) == [
+        ".qwikcrud.json.lock"
+    ]
+
+
+@pytest.mark.parametrize("archive_format", ["zip", "tar", "tar.gz"])
+def test_archive(tmp_path: Path, archive_format: str):
+    FastAPIAppGenerator(tmp_path).generate(load_app())
+    tree = FastAPIAppGenerator(tmp_path / "unused").render(load_app())
+    buffer = io.BytesIO()
+    tree.write_archive(buffer, archive_format)
+    buffer.seek(0)
+    if archive_format == "zip":
+        with zipfile.ZipFile(buffer) as zf:
+            files = {name: zf.read(name).decode() for name in zf.namelist()}
+    else:
+        with tarfile.open(fileobj=buffer) as tf:
+            files = {
+                member.name: tf.extractfile(member).read().decode()
+                for member in tf.getmembers()
+            }
+    assert files == read_tree(tmp_path)
+    assert not (tmp_path / "unused").exists()
+
+
+def test_format_cache(tmp_path: Path):
+    cache = DiskCache(tmp_path / "cache", max_size=1024 * 1024)
+    generator = FastAPIAppGenerator(tmp_path / "first", format_cache=cache)
+    generator.generate(load_app())
+    assert generator.format_cache_hits == 0
+    assert generator.format_cache_misses > 0
+
+    generator = FastAPIAppGenerator(tmp_path / "second", format_cache=cache)
+    generator.generate(load_app())
+    assert generator.format_cache_hits > 0
+    assert generator.format_cache_misses == 0
+    assert read_tree(tmp_path / "first") == read_tree(tmp_path / "second")
+
+
+def test_template_bytecode_cache(tmp_path: Path):
+    generator = FastAPIAppGenerator(
+        tmp_path / "first", template_cache_dir=tmp_path / "cache"
+    )
+    generator.compile_templates()
+    assert len(list((tmp_path / "cache").iterdir())) > 0
+
+    generator = FastAPIAppGenerator(
+        tmp_path / "second", template_cache_dir=tmp_path / "cache"
+    )
+    generator.env.compile = Mock(wraps=generator.env.compile)
+    generator.generate(load_app())
+    generator.env.compile.assert_not_called()
+    assert "app/models.py" in read_tree(tmp_path / "second")
+
+
+def test_profiler_records_each_phase(tmp_path: Path):
+    profiler = Profiler()
+    FastAPIAppGenerator(tmp_path, profiler=profiler).generate(load_app())
+    assert set(profiler.totals()) == {"render", "format", "write"}
+    for phase in ["render", "format", "write"]:
+        files = {span.name for span in profiler.spans if span.category == phase}
+        assert "app/models.py" in files, phase
+
+
+def test_warm_up_keeps_worker_processes(tmp_path: Path, monkeypatch):
+    code_generator = FastAPIAppGenerator(tmp_path, jobs=2)
+    code_generator.warm_up()
+    code_generator.env.compile = Mock(wraps=code_generator.env.compile)
+    monkeypatch.setattr(
+        generator, "ProcessPoolExecutor", Mock(side_effect=AssertionError)
+    )
+    try:
+        code_generator.generate(load_app())
+        app = load_app()
+        app.name = "Another app"
+        code_generator.generate(app, incremental=True)
+    finally:
+        code_generator.close()
+    code_generator.env.compile.assert_not_called()
+    assert "Another app" in (tmp_path / "README.md").read_text()
+
+
+def import_generated_app(
+    tmp_path: Path, monkeypatch, async_db: bool, app: Optional[App] = None
+):
+    """Generate the app (the dummy app by default), over the app already in
+    `tmp_path` if any, and import it. Return the FastAPI app and the list the SQL
+    statements it runs are appended to"""
+    for module in ["fastapi", "starlette_admin", "sqlalchemy_file", "aiosqlite"]:
+        pytest.importorskip(module)
+    from sqlalchemy import event
+    from sqlalchemy_file.storage import StorageManager
+
+    FastAPIAppGenerator(tmp_path, async_db=async_db).generate(
+        app or load_app(), incremental=True
+    )
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    for module in [name for name in sys.modules if name.split(".")[0] == "app"]:
+        monkeypatch.delitem(sys.modules, module)
+    # The storages added by the app on startup are global
+    monkeypatch.setattr(StorageManager, "_storages", {})
+    from app.db import engine
+    from app.main import app
+
+    statements = []
+    event.listen(
+        engine.sync_engine if async_db else engine,
+        "before_cursor_execute",
+        lambda *args: statements.append(args[2]),
+    )
+    return app, statements
+
+
+@pytest.mark.parametrize("async_db", [False, True], ids=["sync", "async"])
+def test_generated_app_runs(tmp_path: Path, monkeypatch, async_db: bool):
+    # Switching from the other mode
+    FastAPIAppGenerator(tmp_path, async_db=not async_db).generate(load_app())
+    app, _ = import_generated_app(tmp_path, monkeypatch, async_db)
+    from fastapi.testclient import TestClient
+
+    with TestClient(app) as client:
+        response = client.post(
+            "/api/v1/products/",
+            json={"name": "p", "description": "", "price": 1, "in_stock": True},
+        )
+        assert response.status_code == 201, response.text
+        response = client.get("/api/v1/products/")
+        assert response.status_code == 200, response.text
+        assert [product["name"] for product in response.json()] == ["p"]
+
+
+@pytest.mark.parametrize("async_db", [False, True], ids=["sync", "async"])
+def test_cursor_pagination(tmp_path: Path, monkeypatch, async_db: bool):
+    spec = load_app()
+    # Nullable fields (`not_null` makes them optional), sharing their values
+    spec.get_entity("Product").fields += [
+        FieldModel(name="rating", type="Float", constraints={"not_null": True}),
+        FieldModel(
+            name="status",
+            type="Enum",
+            constraints={"not_null": True, "allowed_values": ["b", "a z"]},
+        ),
+    ]
+    app, statements = import_generated_app(tmp_path, monkeypatch, async_db, spec)
+    from fastapi.testclient import TestClient
+
+    with TestClient(app) as client:
+        for i in range(23):
+            client.post(
+                "/api/v1/products/",
+                json={
+                    "name": "p",
+                    "description": "",
+                    "price": 1,
+                    "in_stock": True,
+                    "rating": [None, 1.5, 2.0][i % 3],
+                    "status": [None, "b", "a z"][i % 4 % 3],
+                },
+            )
+        # Sorted by the stored values: NULL first, the enums by member name
+        for order_by, stored_value in [
+            ("rating", lambda rating: rating or 0),
+            ("status", lambda status: (status or "").upper().replace(" ", "_")),
+        ]:
+            products, cursor = [], None
+            while True:
+                params = {"limit": 4, "order_by": order_by}
+                if cursor is not None:
+                    params["cursor"] = cursor
+                response = client.get("/api/v1/products/", params=params)
+                assert response.status_code == 200, response.text
+                products += response.json()
+                cursor = response.headers.get("X-Next-Cursor")
+                if cursor is None:
+                    break
+            assert sorted(product["id"] for product in products) == list(range(1, 24))
+            keys = [
+                (
+                    product[order_by] is not None,
+                    stored_value(product[order_by]),
+                    product["id"],
+                )
+                for product in products
+            ]
+            assert keys == sorted(keys)
+        # Unsupported by MySQL
+        assert not any("NULLS FIRST" in statement for statement in statements)
+        response = client.get("/api/v1/products/", params={"cursor": "tampered"})
+        assert response.status_code == 400
+
+
+@pytest.mark.parametrize("async_db", [False, True], ids=["sync", "async"])
+def test_pool_size_only_applies_to_queue_pools(
+    tmp_path: Path, monkeypatch, async_db: bool
+):
+    # SQLite in-memory databases use a pool without size
+    driver = "sqlite+aiosqlite" if async_db else "sqlite"
+    monkeypatch.setenv("SQLALCHEMY_DATABASE_URI", f"{driver}://")
+    import_generated_app(tmp_path, monkeypatch, async_db)
+    from app.db import pool_options
+
+    assert "pool_size" not in pool_options(f"{driver}://")
+    assert pool_options("postgresql://localhost/db")["pool_size"] == 5
+
+
+@pytest.mark.parametrize("async_db", [False, True], ids=["sync", "async"])
+def test_relationship_endpoints_run_a_fixed_number_of_queries(
+    tmp_path: Path, monkeypatch, async_db: bool
+):
+    app, statements = import_generated_app(tmp_path, monkeypatch, async_db)
+    from fastapi.testclient import TestClient
+
+    def count_queries(method: str, url: str, **kwargs) -> int:
+        statements.clear()
+        response = client.request(method, url, **kwargs)
+        assert response.status_code == 200, response.text
+        return len(statements)
+
+    with TestClient(app) as client:
+        user_id = client.post(
+            "/api/v1/users/",
+            json={
+                "username": "user",
+                "email": "user@example.com",
+                "password": "password",
+                "first_name": "first",
+                "last_name": "last",
+                "bio": "bio",
+            },
+        ).json()["id"]
+        order_id = client.post(
+            "/api/v1/orders/",
+            json={"order_date": "2024-01-01", "total_amount": 1, "is_paid": False},
+        ).json()["id"]
+        product_ids = [
+            client.post(
+                "/api/v1/products/",
+                json={"name": "p", "description": "", "price": 1, "in_stock": True},
+            ).json()["id"]
+            for _ in range(12)
+        ]
+        for url in [f"/api/v1/users/{user_id}", f"/api/v1/orders/{order_id}"]:
+            counts = [
+                count_queries("PUT", f"{url}/products", json=product_ids[:2]),
+                count_queries("PUT", f"{url}/products", json=product_ids[2:]),
+                count_queries("GET", f"{url}/products?limit=2"),
+                count_queries("GET", f"{url}/products?limit=20"),
+            ]
+            # The object, the products and the statements adding them
+            assert counts[0] == counts[1] <= 4
+            # The object and the page of products
+            assert counts[2] == counts[3] == 2
+            assert len(client.get(f"{url}/products").json()) == 12
+        response = client.put(f"/api/v1/users/{user_id}/products", json=[998, 999])
+        assert response.status_code == 404
+        assert response.json()["detail"] == "Product with ids: [998, 999] not found"
+
+
+@pytest.mark.parametrize("async_db", [False, True], ids=["sync", "async"])
+def test_bulk_endpoints(tmp_path: Path, monkeypatch, async_db: bool):
+    app, statements = import_generated_app(tmp_path, monkeypatch, async_db)
+    from fastapi.testclient import TestClient
+
+    with TestClient(app) as client:
+        statements.clear()
+        response = client.post(
+            "/api/v1/products/bulk",
+            json=[
+                {"name": name, "description": "", "price": 1, "in_stock": True}
+                for name in ["a", "b", "c"]
+            ],
+        )
+        assert response.status_code == 201
+        assert [product["name"] for product in response.json()] == ["a", "b", "c"]
+        # The created objects are returned by the INSERT statements
+        assert all(statement.startswith("INSERT") for statement in statements)
+        a, b, c = (product["id"] for product in response.json())
+        response = client.patch(
+            "/api/v1/products/bulk", json=[{"id": c, "price": 3}, {"id": a, "price": 2}]
+        )
+        assert [product["price"] for product in response.json()] == [3, 2]
+        # The missing ids fail the whole batch
+        response = client.patch(
+            "/api/v1/products/bulk", json=[{"id": a, "price": 4}, {"id": 999}]
+        )
+        assert response.json()["detail"] == "Product with ids: [999] not found"
+        assert client.get(f"/api/v1/products/{a}").json()["price"] == 2
+        order_id = client.post(
+            "/api/v1/orders/",
+            json={"order_date": "2024-01-01", "total_amount": 1, "is_paid": False},
+        ).json()["id"]
+        client.put(f"/api/v1/orders/{order_id}/products", json=[a, b, c])
+        response = client.request("DELETE", "/api/v1/products/bulk", json=[a, b])
+        assert [product["id"] for product in response.json()] == [a, b]
+        response = client.get(f"/api/v1/orders/{order_id}/products")
+        assert [product["id"] for product in response.json()] == [c]
@@ -0,0 +1,42 @@
+import json
+from pathlib import Path
+
+from rich.console import Console
+
+from qwikcrud.cli import profile_table
+from qwikcrud.generator import FastAPIAppGenerator
+from qwikcrud.profiling import Profiler
+from qwikcrud.provider.dummy import DummyAIProvider
+
+
+def test_query_phases():
+    provider = DummyAIProvider(delay=0)
+    provider.profiler = Profiler()
+    provider.query("An e-commerce app")
+    assert set(provider.profiler.totals()) == {"llm", "validation"}
+
+
+def test_trace(tmp_path: Path):
+    profiler = Profiler()
+    provider = DummyAIProvider(delay=0)
+    provider.profiler = profiler
+    app = provider.query("An e-commerce app")
+    FastAPIAppGenerator(tmp_path / "app", profiler=profiler).generate(app)
+
+    profiler.write_trace(tmp_path / "trace.json")
+    events = json.loads((tmp_path / "trace.json").read_text())["traceEvents"]
+    assert len(events) == len(profiler.spans)
+    assert {event["cat"] for event in events} == {
+        "llm",
+        "validation",
+        "render",
+        "format",
+        "write",
+    }
+    assert all(event["ph"] == "X" and event["dur"] >= 0 for event in events)
+
+    console = Console(width=200)
+    with console.capture() as capture:
+        console.print(profile_table(profiler))
+    output = capture.get()
+    assert all(phase in output for phase in ["llm", "validation", "format"])
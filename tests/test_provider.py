@@ -0,0 +1,227 @@
+import asyncio
+import json
+import time
+from unittest.mock import Mock
+
+import httpx
+import pytest
+
+from qwikcrud.cache import DiskCache
+from qwikcrud.provider import http
+from qwikcrud.provider.base import ContextStrategy
+from qwikcrud.provider.cache import ResponseCache, ResponseCacheMissError
+from qwikcrud.provider.dummy import DummyAIProvider
+from qwikcrud.provider.google import GoogleProvider
+from qwikcrud.provider.hedged import HedgedProvider
+from qwikcrud.provider.openai import OpenAIProvider
+from qwikcrud.settings import settings
+
+
+def dummy_json() -> str:
+    return DummyAIProvider()._read_response()
+
+
+def test_concurrent_aqueries():
+    async def main():
+        providers = [DummyAIProvider(delay=0.2) for _ in range(10)]
+        start = time.perf_counter()
+        apps = await asyncio.gather(*(p.aquery("An e-commerce app") for p in providers))
+        return apps, time.perf_counter() - start
+
+    apps, duration = asyncio.run(main())
+    assert len(apps) == 10
+    assert duration < 1
+
+
+def test_aquery_timeout_leaves_conversation_unchanged():
+    provider = DummyAIProvider(delay=1)
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(provider.aquery("An e-commerce app", timeout=0.05))
+    assert provider.messages == []
+
+
+def test_async_client_is_shared_within_event_loop():
+    async def main():
+        client = http.get_async_client()
+        assert http.get_async_client() is client
+        await http.close_async_client()
+        assert client.is_closed
+
+    asyncio.run(main())
+
+
+@pytest.fixture()
+def mock_http(monkeypatch):
+    requests = []
+
+    def mock_client(handler):
+        def _handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            return handler(request)
+
+        client = httpx.AsyncClient(transport=httpx.MockTransport(_handler))
+        monkeypatch.setattr(http, "get_async_client", lambda: client)
+
+    mock_client.requests = requests
+    return mock_client
+
+
+def test_openai_aquery(mock_http, monkeypatch):
+    monkeypatch.setattr(settings, "openai_api_key", "sk-test")
+    mock_http(
+        lambda _: httpx.Response(
+            200, json={"choices": [{"message": {"content": dummy_json()}}]}
+        )
+    )
+    provider = OpenAIProvider()
+    app = asyncio.run(provider.aquery("An e-commerce app"))
+    assert len(app.entities) == 4
+    (request,) = mock_http.requests
+    assert request.url == "https://api.openai.com/v1/chat/completions"
+    assert request.headers["Authorization"] == "Bearer sk-test"
+    assert json.loads(request.content)["messages"][-1] == {
+        "role": "user",
+        "content": "An e-commerce app",
+    }
+    assert provider.messages[-1]["role"] == "assistant"
+
+
+def test_google_aquery(mock_http, monkeypatch):
+    monkeypatch.setattr(settings, "google_api_key", "test")
+    mock_http(
+        lambda _: httpx.Response(
+            200,
+            json={"candidates": [{"content": {"parts": [{"text": dummy_json()}]}}]},
+        )
+    )
+    provider = GoogleProvider()
+    app = asyncio.run(provider.aquery("An e-commerce app"))
+    assert len(app.entities) == 4
+    (request,) = mock_http.requests
+    assert request.url.params["key"] == "test"
+    assert json.loads(request.content)["contents"][-1] == {
+        "role": "user",
+        "parts": [{"text": "An e-commerce app"}],
+    }
+
+
+def test_response_cache(tmp_path):
+    cache = DiskCache(tmp_path, max_size=1024 * 1024)
+    provider = DummyAIProvider(delay=0)
+    provider.response_cache = ResponseCache(cache)
+    app = provider.query("An e-commerce app")
+
+    provider = DummyAIProvider(delay=0)
+    provider.response_cache = ResponseCache(cache, replay=True)
+    provider._complete = Mock(side_effect=provider._complete)
+    assert provider.query("An e-commerce app") == app
+    provider._complete.assert_not_called()
+    assert len(provider.messages) == 2
+
+    with pytest.raises(ResponseCacheMissError):
+        provider.query("Add a Category entity")
+
+
+def test_invalid_responses_are_not_cached(tmp_path):
+    cache = DiskCache(tmp_path, max_size=1024 * 1024)
+    provider = DummyAIProvider(delay=0)
+    provider.response_cache = ResponseCache(cache)
+    provider._read_response = lambda: "Not an app"
+    with pytest.raises(ValueError):
+        provider.query("An e-commerce app")
+    assert list(tmp_path.rglob("*/*")) == []
+
+
+def test_compact_context_keeps_request_size_constant():
+    sizes = {}
+    for context in ContextStrategy:
+        provider = DummyAIProvider(delay=0)
+        provider.context = context
+        for i in range(5):
+            provider.query(f"Modification {i}")
+        sizes[context] = [stats.request_size for stats in provider.turn_stats]
+    full, compact = sizes[ContextStrategy.FULL], sizes[ContextStrategy.COMPACT]
+    assert full == sorted(full)
+    assert full[-1] > 4 * full[0]
+    assert max(compact[1:]) == min(compact[1:])
+    assert compact[-1] < full[1]
+
+
+def test_compact_context_sends_current_app():
+    provider = DummyAIProvider(delay=0)
+    provider.context = ContextStrategy.COMPACT
+    app = provider.query("An e-commerce app")
+    provider.query("Add a Category entity")
+    assert len(provider.messages) == 2
+    content = provider.messages[0]["content"]
+    assert content.endswith("Add a Category entity")
+    assert app.model_dump_json(by_alias=True, exclude_defaults=True) in content
+
+
+def test_invalid_response_is_corrected(tmp_path):
+    cache = DiskCache(tmp_path, max_size=1024 * 1024)
+    provider = DummyAIProvider(delay=0)
+    provider.response_cache = ResponseCache(cache)
+    provider.query("An e-commerce app")
+    invalid = dummy_json().replace('"to": "Address"', '"to": "Location"')
+    responses = iter([invalid, dummy_json()])
+    sent = []
+
+    def complete() -> str:
+        sent.append(list(provider.messages))
+        return next(responses)
+
+    provider._complete = complete
+    app = provider.query("Add a Location entity")
+    assert app.relations[0].to == "Address"
+    # The correction is asked without the rest of the conversation
+    assert len(sent[0]) == 3
+    (correction,) = sent[1]
+    assert "relations.0.to: Unknown entity 'Location'" in correction["content"]
+    assert provider.messages[-1]["content"] == dummy_json()
+
+    provider = DummyAIProvider(delay=0)
+    provider.response_cache = ResponseCache(cache, replay=True)
+    provider.query("An e-commerce app")
+    assert provider.query("Add a Location entity") == app
+
+
+def test_hedged_query_uses_first_valid_app():
+    slow, fast = DummyAIProvider(delay=1), DummyAIProvider(delay=0.05)
+    provider = HedgedProvider([slow, fast], hedge_delay=0.1)
+    start = time.perf_counter()
+    app = provider.query("An e-commerce app")
+    assert time.perf_counter() - start < 0.5
+    assert provider.last_provider is fast
+    # The cancelled query is replaced by the turn answered by the other provider
+    assert slow.turn_stats == []
+    assert [m["role"] for m in slow.messages] == ["user", "assistant"]
+    assert slow.app == app
+
+
+def test_hedged_query_waits_for_the_delay():
+    first, second = DummyAIProvider(delay=0.05), DummyAIProvider(delay=0)
+    provider = HedgedProvider([first, second], hedge_delay=1)
+    provider.query("An e-commerce app")
+    assert provider.last_provider is first
+    assert second.turn_stats == []
+
+    provider.hedge_delay = 0
+    provider.query("Add a Category entity")
+    assert provider.last_provider is second
+    assert len(first.messages) == len(second.messages) == 4
+
+
+def test_hedged_query_after_failure():
+    failing, second = DummyAIProvider(delay=0), DummyAIProvider(delay=0)
+    failing._read_response = lambda: "Not an app"
+    provider = HedgedProvider([failing, second], hedge_delay=10)
+    start = time.perf_counter()
+    provider.query("An e-commerce app")
+    assert time.perf_counter() - start < 1
+    assert provider.last_provider is second
+    assert [m["role"] for m in failing.messages] == ["user", "assistant"]
+
+    second._read_response = failing._read_response
+    with pytest.raises(ValueError, match="Invalid app"):
+        provider.query("Add a Category entity")
@@ -0,0 +1,70 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from qwikcrud.repair import InvalidAppError, parse_app
+from qwikcrud.schemas import App, FieldType, RelationType
+
+
+def dummy_data() -> dict:
+    return json.loads((Path(__file__).parent / "dummy.json").read_text())
+
+
+def test_valid_response_is_unchanged():
+    content = (Path(__file__).parent / "dummy.json").read_text()
+    assert parse_app(content) == App.model_validate_json(content)
+
+
+def test_repair():
+    data = dummy_data()
+    user, address = data["entities"][:2]
+    user["name"] = "user"
+    user["fields"][1]["constraints"] = None
+    user["fields"][2]["type"] = "varchar"
+    address["fields"][1]["constraints"] = {"maxLength": 100}
+    relation = data["relations"][0]
+    relation["type"] = "one-to-one"
+    relation["from"] = "USER"
+    content = f"Here is the app:\n{json.dumps(data)}\nLet me know if it suits you."
+
+    app = parse_app(content)
+    assert app.entities[0].fields[1].constraints.unique is None
+    assert app.entities[0].fields[2].type_ == FieldType.String
+    assert app.entities[1].fields[1].constraints.max_length == 100
+    assert app.relations[0].type_ == RelationType.ONE_TO_ONE
+    assert app.relations[0].from_ == "User"
+    assert app.get_entity("User") is not None
+
+
+def test_missing_relations():
+    data = dummy_data()
+    del data["relations"]
+    assert parse_app(json.dumps(data)).relations == []
+
+
+@pytest.mark.parametrize(
+    "content, error",
+    [
+        ("I can't help with that.", "The response is not a JSON object"),
+        ('{"name": "app", "entities": [', "The response is not a JSON object"),
+        (
+            '{"name": "app", "entities": [], "relations": []}',
+            "description: Field required",
+        ),
+    ],
+)
+def test_invalid_response(content: str, error: str):
+    with pytest.raises(InvalidAppError) as e:
+        parse_app(content)
+    assert e.value.errors[0].startswith(error)
+    assert error in e.value.correction_prompt()
+
+
+def test_unknown_entity():
+    data = dummy_data()
+    data["relations"][0]["to"] = "Location"
+    with pytest.raises(InvalidAppError) as e:
+        parse_app(json.dumps(data))
+    assert e.value.errors == ["relations.0.to: Unknown entity 'Location'"]
+    assert '"to":"Location"' in e.value.correction_prompt()
@@ -0,0 +1,39 @@
+from pathlib import Path
+
+import pytest
+
+from qwikcrud.provider.dummy import DummyAIProvider
+from qwikcrud.schemas import App, Entity, Relation
+from qwikcrud.streaming import AppStreamParser
+
+
+def load_dummy_json() -> str:
+    with open(Path(__file__).parent / "dummy.json") as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 100, 100_000])
+def test_stream_parser_yields_items_in_order(chunk_size: int):
+    text = f"Here is your app:\n```json\n{load_dummy_json()}\n```"
+    parser = AppStreamParser()
+    items = []
+    for i in range(0, len(text), chunk_size):
+        items.extend(parser.feed(text[i : i + chunk_size]))
+    app = App.model_validate_json(load_dummy_json())
+    assert items == [*app.entities, *app.relations]
+    assert isinstance(items[0], Entity)
+    assert isinstance(items[-1], Relation)
+
+
+def test_stream_parser_handles_strings_with_braces():
+    parser = AppStreamParser()
+    items = parser.feed(
+        '{"name": "a {b} \\"[c]", "entities": [{"name": "Task", "fields": []}'
+    )
+    assert [item.name for item in items] == ["Task"]
+
+
+def test_query_stream_reports_progress():
+    received = []
+    app = DummyAIProvider().query_stream("An e-commerce app", received.append)
+    assert received == [*app.entities, *app.relations]
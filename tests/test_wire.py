@@ -0,0 +1,61 @@
+from pathlib import Path
+
+import pytest
+
+from qwikcrud.provider.dummy import DummyAIProvider
+from qwikcrud.repair import parse_app
+from qwikcrud.schemas import App
+from qwikcrud.streaming import AppStreamParser
+from qwikcrud.wire import WireFormat, decode_relation, encode_app
+
+EXAMPLES = Path(__file__).parent.parent / "examples/fastapi/task-management/generated"
+
+
+@pytest.mark.parametrize(
+    "spec",
+    [
+        Path(__file__).parent / "dummy.json",
+        EXAMPLES / "openai/.qwikcrud.json.lock",
+        EXAMPLES / "gemini-pro/.qwikcrud.json.lock",
+    ],
+)
+@pytest.mark.parametrize("wire_format", list(WireFormat))
+def test_encode_decode(spec: Path, wire_format: WireFormat):
+    app = App.model_validate_json(spec.read_text())
+    content = encode_app(app, wire_format)
+    assert parse_app(content, wire_format) == app
+
+
+def test_compact_format_is_shorter():
+    app = App.model_validate_json((Path(__file__).parent / "dummy.json").read_text())
+    json_size = len(encode_app(app, WireFormat.JSON))
+    assert len(encode_app(app, WireFormat.COMPACT)) < json_size / 2
+
+
+def test_decode_invalid_items():
+    content = '{"n":"app","d":"An app","e":[["Task"]],"r":[["Task_Users","1n"]]}'
+    with pytest.raises(ValueError, match="entities.0") as e:
+        parse_app(content, WireFormat.COMPACT)
+    assert e.value.content == content
+
+
+def test_decode_many_to_one_relation():
+    relation = ["Product_User", "N1", "Product", "User", "user", "products"]
+    assert decode_relation(relation) == decode_relation(
+        ["Product_User", "1N", "User", "Product", "products", "user"]
+    )
+
+
+def test_query_stream_compact():
+    received = []
+    provider = DummyAIProvider(delay=0, wire_format=WireFormat.COMPACT)
+    app = provider.query_stream("An e-commerce app", received.append)
+    assert app == DummyAIProvider(delay=0).query("An e-commerce app")
+    assert received == [*app.entities, *app.relations]
+    assert '"mx":' in provider._system_prompt()
+
+
+def test_stream_parser_compact():
+    parser = AppStreamParser(WireFormat.COMPACT)
+    items = parser.feed('{"n":"app","e":[["Task",[["id","ID"]]],["Us')
+    assert [item.name for item in items] == ["Task"]